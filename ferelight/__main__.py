@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 import json
+import logging
 
 import connexion
 
+from ferelight import bootstrap
 from ferelight import encoder
+from ferelight import metadata
+from ferelight import pool
+from ferelight import textencoder
+from ferelight import textindex
 
 
 def main():
@@ -13,6 +19,16 @@ def main():
                 arguments={'title': 'FERElight'},
                 pythonic_params=True)
     app.app.config.from_file('../config.json', load=json.load)
+    logging.basicConfig(level=app.app.config.get('LOGLEVEL', 'INFO'),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    pool.configure(app.app.config)
+    bootstrap.bootstrap_databases(app.app.config.get('DATABASES', []))
+    if app.app.config.get('METADATACACHE', True):
+        metadata.load_databases(app.app.config.get('DATABASES', []))
+    textindex.load_databases(app.app.config.get('DATABASES', []))
+    text_encoder = textencoder.configure(app.app.config)
+    if app.app.config.get('CLIPWARMUP', True):
+        text_encoder.warm_up()
 
     app.run(port=8080)
 
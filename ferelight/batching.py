@@ -0,0 +1,81 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Merges calls from concurrent threads into batched calls of a function.
+
+    ``fn`` takes a list of items and returns a list of results in the same order. Items submitted within ``window``
+    seconds of the first waiting item are passed to a single call of ``fn``, up to ``max_batch_size`` items. All calls
+    of ``fn`` happen on one worker thread, so ``fn`` does not need to be thread-safe. A window of ``0`` disables
+    batching and calls ``fn`` directly on the calling thread.
+    """
+
+    def __init__(self, fn, window=0.005, max_batch_size=64, name='micro-batcher'):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self._fn = fn
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def __call__(self, items):
+        if self.window <= 0:
+            return self._fn(items)
+        return self.submit(items).result()
+
+    def submit(self, items):
+        """Queues a list of items and returns a future for the list of their results."""
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        self._ensure_worker()
+        self._queue.put((list(items), future))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+            self._process(batch)
+
+    def _process(self, batch):
+        items = [item for (request_items, _) in batch for item in request_items]
+        try:
+            results = self._fn(items)
+        except Exception as e:
+            logger.exception('%s failed on a batch of %d items', self.name, len(items))
+            for (_, future) in batch:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for (request_items, future) in batch:
+            future.set_result(results[start:start + len(request_items)])
+            start += len(request_items)
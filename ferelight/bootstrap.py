@@ -0,0 +1,162 @@
+import logging
+import threading
+
+from pgvector.psycopg2.vector import register_vector_info
+
+logger = logging.getLogger(__name__)
+
+# Tables FERElight reads from, mapped to the indexes the query paths rely on. Each index is described by a predicate
+# over its definition in pg_indexes, a readable name for the log, and the statement that creates it.
+EXPECTED_INDEXES = {
+    'features_openclip': [
+        (lambda definition: 'USING hnsw' in definition and 'vector_cosine_ops' in definition,
+         'HNSW index with vector_cosine_ops on feature',
+         'CREATE INDEX ON features_openclip USING hnsw (feature vector_cosine_ops)'),
+        (lambda definition: 'UNIQUE' in definition and '(id)' in definition,
+         'unique index on id',
+         'CREATE UNIQUE INDEX ON features_openclip (id)'),
+    ],
+    'features_ocr': [
+        (lambda definition: 'USING gin' in definition,
+         'GIN index on feature',
+         'CREATE INDEX ON features_ocr USING gin (feature)'),
+    ],
+    'features_asr': [
+        (lambda definition: 'USING gin' in definition,
+         'GIN index on feature',
+         'CREATE INDEX ON features_asr USING gin (feature)'),
+    ],
+    'cineast_segment': [
+        (lambda definition: '(segmentid' in definition,
+         'index on segmentid',
+         'CREATE UNIQUE INDEX ON cineast_segment (segmentid)'),
+        (lambda definition: '(objectid' in definition,
+         'index on objectid',
+         'CREATE INDEX ON cineast_segment (objectid)'),
+    ],
+    'cineast_multimediaobject': [
+        (lambda definition: '(objectid' in definition,
+         'index on objectid',
+         'CREATE UNIQUE INDEX ON cineast_multimediaobject (objectid)'),
+    ],
+}
+
+_databases = {}
+_lock = threading.Lock()
+
+
+class DatabaseInfo:
+    """What the bootstrap learned about a database: the pgvector version, type OIDs, size and what is missing."""
+
+    def __init__(self, database, extension_version, vector_oid, vector_array_oid, missing_tables, missing_indexes,
+                 feature_count=None):
+        self.database = database
+        self.extension_version = extension_version
+        self.vector_oid = vector_oid
+        self.vector_array_oid = vector_array_oid
+        self.missing_tables = missing_tables
+        self.missing_indexes = missing_indexes
+        self.feature_count = feature_count
+
+    @property
+    def supports_iterative_scan(self):
+        """Whether HNSW scans can continue past ef_search until enough rows pass a filter, new in pgvector 0.8."""
+        version = tuple(int(part) for part in self.extension_version.split('.')[:2] if part.isdigit())
+        return version >= (0, 8)
+
+
+def bootstrap_database(conn, database):
+    """Checks the pgvector extension, the tables and their indexes of a database.
+
+    The extension is only created if it is missing. Missing tables and indexes are logged together with the statement
+    that would create them, but are not created, since building an index on a large table is an operator's decision.
+
+    :param conn: An open connection to the database.
+    :param database: The name of the database.
+    :rtype: DatabaseInfo
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cur.fetchone()
+        if row is None:
+            logger.info('Creating the pgvector extension in database %s', database)
+            cur.execute('CREATE EXTENSION IF NOT EXISTS vector')
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cur.fetchone()
+        extension_version = row[0]
+
+        cur.execute("SELECT typname, oid FROM pg_type WHERE oid IN (to_regtype('vector'), to_regtype('_vector'))")
+        type_info = dict(cur.fetchall())
+
+        tables = list(EXPECTED_INDEXES)
+        cur.execute("SELECT relname FROM pg_class WHERE relkind IN ('r', 'p', 'm', 'v') AND relname = ANY(%s)",
+                    (tables,))
+        present = {relname for (relname,) in cur.fetchall()}
+        cur.execute('SELECT tablename, indexdef FROM pg_indexes WHERE tablename = ANY(%s)', (tables,))
+        definitions = {}
+        for (tablename, indexdef) in cur.fetchall():
+            definitions.setdefault(tablename, []).append(indexdef)
+
+        # The planner's estimate is enough to judge how selective a filter is, and unlike count(*) it is free
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass('features_openclip')")
+        row = cur.fetchone()
+        feature_count = row[0] if row is not None and row[0] > 0 else None
+    conn.commit()
+
+    missing_tables = [table for table in tables if table not in present]
+    for table in missing_tables:
+        logger.warning('Database %s has no table %s, queries using it will fail', database, table)
+
+    missing_indexes = []
+    for table, indexes in EXPECTED_INDEXES.items():
+        if table not in present:
+            continue
+        for (matches, description, statement) in indexes:
+            if not any(matches(definition) for definition in definitions.get(table, [])):
+                missing_indexes.append((table, description))
+                logger.warning('Database %s: table %s has no %s, queries on it will scan the whole table. '
+                               'Create it with: %s', database, table, description, statement)
+
+    return DatabaseInfo(database, extension_version, type_info['vector'], type_info.get('_vector'),
+                        missing_tables, missing_indexes, feature_count)
+
+
+def get_database_info(conn, database):
+    """Returns the bootstrap result of a database, bootstrapping it the first time it is seen."""
+    info = _databases.get(database)
+    if info is not None:
+        return info
+
+    with _lock:
+        info = _databases.get(database)
+        if info is None:
+            info = bootstrap_database(conn, database)
+            _databases[database] = info
+    return info
+
+
+def prepare_connection(conn):
+    """Registers the vector adapter on a new pooled connection with the type OIDs cached for its database."""
+    info = get_database_info(conn, conn.info.dbname)
+    register_vector_info(info.vector_oid, info.vector_array_oid, conn)
+
+
+def bootstrap_databases(databases):
+    """Bootstraps the given databases at startup by opening their first pooled connection."""
+    from ferelight import pool
+
+    for database in databases:
+        try:
+            with pool.get_connection(database):
+                pass
+        except Exception:
+            logger.exception('Could not bootstrap database %s, retrying when it is first queried', database)
+
+
+def invalidate(database=None):
+    """Forgets the bootstrap result of one or all databases, e.g. after indexes were created."""
+    with _lock:
+        if database is None:
+            _databases.clear()
+        else:
+            _databases.pop(database, None)
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A bounded, thread-safe least-recently-used cache.
+
+    The cache holds at most ``maxsize`` entries and, if ``maxbytes`` is given, at most ``maxbytes`` bytes as measured
+    by ``sizeof``. The least recently used entries are evicted first when either bound is exceeded. If ``ttl`` is
+    given, entries expire that many seconds after they were put.
+    """
+
+    def __init__(self, maxsize=1024, maxbytes=None, sizeof=None, ttl=None):
+        if maxbytes is not None and sizeof is None:
+            raise ValueError('sizeof is required when maxbytes is set')
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._sizeof = sizeof
+        self.ttl = ttl
+        # key -> (value, size in bytes, expiry time or None)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value) if self._sizeof is not None else 0
+        with self._lock:
+            self._remove(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._entries[key] = (value, size, None if self.ttl is None else time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.maxsize or (self.maxbytes is not None and self._bytes > self.maxbytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._remove(key)
+            return default if entry is None else entry[0]
+
+    def remove_if(self, predicate):
+        """Removes all entries whose key matches ``predicate`` and returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hitrate': self.hits / lookups if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _expired(entry):
+        return entry[2] is not None and entry[2] <= time.monotonic()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        return entry
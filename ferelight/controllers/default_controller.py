@@ -1,27 +1,99 @@
+import logging
+import unicodedata
+
 import numpy as np
-import psycopg2
-import torch
-from flask import current_app
-from pgvector.psycopg2 import register_vector
 
-from ferelight.controllers import tokenizer, model
+from ferelight.cache import LRUCache
 from ferelight.models import Scoredsegment
+from ferelight.models.metadata_database_refresh_post200_response import MetadataDatabaseRefreshPost200Response  # noqa: E501
 from ferelight.models.multimediaobject import Multimediaobject  # noqa: E501
 from ferelight.models.multimediasegment import Multimediasegment  # noqa: E501
 from ferelight.models.objectinfos_post_request import ObjectinfosPostRequest  # noqa: E501
 from ferelight.models.query_post_request import QueryPostRequest  # noqa: E501
+from ferelight.models.ready_get200_response import ReadyGet200Response  # noqa: E501
 from ferelight.models.scoredsegment import Scoredsegment  # noqa: E501
 from ferelight.models.segmentbytime_post200_response import SegmentbytimePost200Response  # noqa: E501
 from ferelight.models.segmentinfos_post_request import SegmentinfosPostRequest  # noqa: E501
+from ferelight.models.segmentsbytime_post_request import SegmentsbytimePostRequest  # noqa: E501
+from ferelight.models.textindex_database_refresh_post200_response import TextindexDatabaseRefreshPost200Response  # noqa: E501
+from ferelight import bootstrap
+from ferelight import fusion
+from ferelight import hybrid
+from ferelight import metadata
+from ferelight import metrics
+from ferelight import parallel
+from ferelight import planner
+from ferelight import pool
+from ferelight import resultcache
+from ferelight import rows
+from ferelight import searchparams
+from ferelight import statements
+from ferelight import streaming
+from ferelight import textencoder
+from ferelight import textindex
+from ferelight import textsearch
 from ferelight import util
+from ferelight import vectorindex
+
+
+logger = logging.getLogger(__name__)
+
+# Text embeddings keyed by (model name, normalized text), each entry is one 512-dimensional float32 vector
+text_embedding_cache = LRUCache(maxsize=4096, maxbytes=16 * 1024 * 1024, sizeof=lambda vector: vector.nbytes)
+metrics.register_cache('text_embeddings', lambda: text_embedding_cache)
+
+# Maximum number of #-separated similarity text parts, each number of parts prepares its own id_intersection statement
+SIMILARITY_PARTS_MAXIMUM = 8
+# id_intersection falls back to rescoring the non-common candidates if fewer than this many are found by all inputs
+INTERSECTION_MINIMUM = 10
+# Minimum score a rescored candidate needs against each input that did not find it
+RESCORE_THRESHOLD = 0.17
+# Merge types that fuse independently searched candidate lists instead of merging inside the database
+LATE_FUSION_MERGETYPES = ('rrf', 'weighted')
+# Merge types of /query, other values are labelled as other in the metrics
+QUERY_MERGETYPES = ('id_intersection', 'vector_addition') + LATE_FUSION_MERGETYPES
+
+# Features of query-by-example seeds keyed by (database, segment ID), users page through the neighbours of the same
+# seeds again and again
+segment_embedding_cache = LRUCache(maxsize=4096, maxbytes=16 * 1024 * 1024, sizeof=lambda vector: vector.nbytes)
+metrics.register_cache('segment_embeddings', lambda: segment_embedding_cache)
+# Seeds of a query by example are searched with their mean vector or fused by reciprocal rank fusion
+EXAMPLE_MERGETYPES = ('centroid', 'rrf')
+# Metadata that query results can include with each segment
+INCLUDES = ('segment', 'object')
 
 
 def get_connection(database):
-    return psycopg2.connect(dbname=database, user=current_app.config['DBUSER'],
-                            password=current_app.config['DBPASSWORD'], host=current_app.config['DBHOST'],
-                            port=current_app.config['DBPORT'])
+    return pool.get_connection(database)
+
+
+def stream_rows(database, name, params, row_type):
+    """Yields the rows of a template as chunks of NDJSON, fetched in batches within one transaction."""
+    with get_connection(database) as conn:
+        for batch in statements.stream(conn, name, params, streaming.get_fetch_size()):
+            yield streaming.lines(list(map(row_type._make, batch)))
+
+
+@metrics.recorded
+def metadata_database_refresh_post(database):  # noqa: E501
+    """Reload the cached object and segment metadata of a database.
+
+     # noqa: E501
 
+    :param database: The name of the database to reload the metadata of.
+    :type database: str
+
+    :rtype: Union[MetadataDatabaseRefreshPost200Response, Tuple[MetadataDatabaseRefreshPost200Response, int], Tuple[MetadataDatabaseRefreshPost200Response, int, Dict[str, str]]
+    """
+    if not metadata.enabled():
+        return "The metadata cache is disabled", 400
+
+    metadata_cache = metadata.refresh(database)
+    return MetadataDatabaseRefreshPost200Response(objects=metadata_cache.object_count,
+                                                  segments=metadata_cache.segment_count)
 
+
+@metrics.recorded
 def objectinfo_database_objectid_get(database, objectid):  # noqa: E501
     """Get the information of an object.
 
@@ -34,14 +106,22 @@ def objectinfo_database_objectid_get(database, objectid):  # noqa: E501
 
     :rtype: Union[Multimediaobject, Tuple[Multimediaobject, int], Tuple[Multimediaobject, int, Dict[str, str]]
     """
-    with get_connection(database) as conn:
-        cur = conn.cursor()
-        cur.execute(f"""SELECT objectid, mediatype, name, path FROM cineast_multimediaobject WHERE objectid = %s""",
-                    (objectid,))
-        (objectid, mediatype, name, path) = cur.fetchone()
-        return Multimediaobject(objectid=objectid, mediatype=mediatype, name=name, path=path)
-
-
+    metadata_cache = metadata.get_cache(database)
+    if metadata_cache is not None:
+        result = next(iter(metadata_cache.objects([objectid])), None)
+    else:
+        with get_connection(database) as conn:
+            cur = conn.cursor()
+            statements.execute(cur, 'objectinfo', (objectid,))
+            result = cur.fetchone()
+
+    if result is None:
+        return {}, 404
+    (objectid, mediatype, name, path) = result
+    return Multimediaobject(objectid=objectid, mediatype=mediatype, name=name, path=path)
+
+
+@metrics.recorded
 def objectinfos_post(body):  # noqa: E501
     """Get the information of multiple objects.
 
@@ -52,19 +132,25 @@ def objectinfos_post(body):  # noqa: E501
 
     :rtype: Union[List[Multimediaobject], Tuple[List[Multimediaobject], int], Tuple[List[Multimediaobject], int, Dict[str, str]]
     """
+    metadata_cache = metadata.get_cache(body['database'])
+    if metadata_cache is not None:
+        object_infos = metadata_cache.objects(body['objectids'])
+        if streaming.requested():
+            return streaming.response(streaming.batched_lines(object_infos))
+        return rows.response(object_infos)
+
+    if streaming.requested():
+        return streaming.response(stream_rows(body['database'], 'objectinfos', (body['objectids'],), rows.ObjectRow))
+
     with get_connection(body['database']) as conn:
         cur = conn.cursor()
-        cur.execute(
-            f"""SELECT objectid, mediatype, name, path FROM cineast_multimediaobject WHERE objectid = ANY(%s)""",
-            (body['objectids'],))
-        results = cur.fetchall()
-
-    object_infos = [Multimediaobject(objectid=objectid, mediatype=mediatype, name=name, path=path) for
-                    (objectid, mediatype, name, path) in results]
+        statements.execute(cur, 'objectinfos', (body['objectids'],))
+        object_infos = list(map(rows.ObjectRow._make, cur.fetchall()))
 
-    return object_infos
+    return rows.response(object_infos)
 
 
+@metrics.recorded
 def objectsegments_database_objectid_get(database, objectid):  # noqa: E501
     """Get the segments of an object.
 
@@ -77,24 +163,26 @@ def objectsegments_database_objectid_get(database, objectid):  # noqa: E501
 
     :rtype: Union[List[Multimediasegment], Tuple[List[Multimediasegment], int], Tuple[List[Multimediasegment], int, Dict[str, str]]
     """
+    metadata_cache = metadata.get_cache(database)
+    if metadata_cache is not None:
+        segmentinfos = metadata_cache.object_segments(objectid)
+        if streaming.requested():
+            return streaming.response(streaming.batched_lines(segmentinfos))
+        return rows.response(segmentinfos)
+
+    if streaming.requested():
+        return streaming.response(stream_rows(database, 'objectsegments', (objectid,), rows.SegmentRow))
+
     with get_connection(database) as conn:
         cur = conn.cursor()
-        cur.execute(
-            f"""
-                SELECT segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs  
-                FROM cineast_segment WHERE objectid = %s""",
-            (objectid,))
-        results = cur.fetchall()
-
-    segmentinfos = [Multimediasegment(segmentid=segmentid, objectid=objectid, segmentnumber=segmentnumber,
-                                      segmentstart=segmentstart, segmentend=segmentend, segmentstartabs=segmentstartabs,
-                                      segmentendabs=segmentendabs) for
-                    (segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs) in
-                    results]
+        statements.execute(cur, 'objectsegments', (objectid,))
+        segmentinfos = list(map(rows.SegmentRow._make, cur.fetchall()))
 
-    return segmentinfos
+    return rows.response(segmentinfos)
 
 ###########################################################
+@metrics.recorded
+@searchparams.recorded
 def query_post(body):  # noqa: E501
     """Query the FERElight engine.
 
@@ -105,222 +193,373 @@ def query_post(body):  # noqa: E501
 
     :rtype: Union[List[Scoredsegment], Tuple[List[Scoredsegment], int], Tuple[List[Scoredsegment], int, Dict[str, str]]
     """
-    limit = f'LIMIT {body["limit"]}' if 'limit' in body else ''
+    include = body.get('include', [])
+    if any(x not in INCLUDES for x in include):
+        return f"Unknown include, expected some of {', '.join(INCLUDES)}", 400
+
+    if 'cursor' in body:
+        try:
+            request, offset, limit, depth = resultcache.decode_cursor(body['cursor'])
+        except ValueError as e:
+            return str(e), 400
+        limit = body.get('limit', limit)
+    else:
+        request, offset, limit = normalize_query(body), body.get('offset', 0), body.get('limit')
+    if offset < 0 or (limit is not None and limit < 1):
+        return "Expected an offset of at least 0 and a limit of at least 1", 400
+    if len([x for x in request.get('similaritytext', '').split('#') if x != ""]) > SIMILARITY_PARTS_MAXIMUM:
+        return f"Expected at most {SIMILARITY_PARTS_MAXIMUM} similarity text parts", 400
+    if request.get('nprobe', 1) < 1:
+        return "Expected an nprobe of at least 1", 400
+
+    mergetype = request.get('mergetype', 'none')
+    metrics.annotate(mergetype=mergetype if mergetype in QUERY_MERGETYPES + ('none',) else 'other')
+
+    # Pages are cut from one deep search that is cached per request, see resultcache
+    end = None if limit is None else offset + limit
+    cached = resultcache.get(request)
+    if 'cursor' in body:
+        # Cursor pages are only cut from the ranking of their cursor, which is searched again if it left the cache
+        hit = cached is not None and cached.depth == depth
+    else:
+        hit = cached is not None and cached.covers(end)
+        depth = resultcache.get_depth(end, first_page=offset == 0)
+    metrics.annotate(cached=hit)
+    if not hit:
+        result = search_query(request if depth is None else dict(request, limit=depth))
+        if not isinstance(result, list):
+            return result
+        cached = resultcache.put(request, result[::-1], depth)
+
+    headers = {}
+    if cached.has_more(end):
+        headers['X-Next-Cursor'] = resultcache.encode_cursor(request, end, limit, cached.depth)
+    page = include_metadata(request['database'], cached.ranked[offset:end][::-1], include)
+    metrics.annotate(results=len(page))
+    if streaming.requested():
+        return streaming.response(streaming.batched_lines(page), 200, headers)
+    return rows.response(page, 200, headers)
 
-    similarity_vector = []
-    if 'similaritytext' in body: similarity_vector = vectorize_textinput(body['similaritytext'])
+
+def normalize_query(body):
+    """Returns the parts of a query that determine its ranking, with the texts normalized like vectorize_textinput."""
+    request = {key: body[key] for key in ('database', 'mergetype', 'weights', 'nprobe') if key in body}
+    for key in ('similaritytext', 'ocrtext', 'asrtext'):
+        if key in body:
+            request[key] = '#'.join(normalize_textinput(x) for x in body[key].split('#'))
+    return request
+
+
+# helping functions for query
+def include_metadata(database, results, include):
+    """Adds the segment and/or object of each scored segment, from the metadata cache or fetched in one statement."""
+    if not include or not results:
+        return results
+
+    segmentids = [x.segmentid for x in results]
+    metadata_cache = metadata.get_cache(database)
+    if metadata_cache is not None:
+        segments = {segment.segmentid: segment for segment in metadata_cache.segments(segmentids)}
+        objects = {obj.objectid: obj for obj in
+                   metadata_cache.objects(list({segment.objectid for segment in segments.values()}))}
+    else:
+        segments, objects = {}, {}
+        with get_connection(database) as conn:
+            cur = conn.cursor()
+            statements.execute(cur, 'segmentobjects', (segmentids,))
+            for row in cur.fetchall():
+                segment = rows.SegmentRow._make(row[:7])
+                segments[segment.segmentid] = segment
+                if row[7] is not None:
+                    objects[segment.objectid] = rows.ObjectRow._make(row[7:])
+
+    details = []
+    for x in results:
+        segment = segments.get(x.segmentid)
+        obj = objects.get(segment.objectid) if segment is not None and 'object' in include else None
+        details.append(rows.DetailedRow(x.segmentid, x.score, segment if 'segment' in include else None, obj))
+    return details
+
+
+def search_query(body):
+    """Runs a query and returns all of its results up to the limit, sorted by ascending score."""
+    if body.get('mergetype') in LATE_FUSION_MERGETYPES:
+        return late_fusion_query(body)
+
+    if 'asrtext' in body and ('ocrtext' in body or 'similaritytext' in body):
+        return multimodal_query(body)
+
+    limit = body.get('limit')
 
     with get_connection(body['database']) as conn:
         cur = conn.cursor()
-        cur.execute('CREATE EXTENSION IF NOT EXISTS vector')
-        register_vector(conn)
-        # Set index parameter to allow for correct number of results
-        if 'limit' in body:
-            cur.execute('SET hnsw.ef_search = %s', (body['limit'],))
 
         if 'ocrtext' in body and not 'similaritytext' in body and not 'asrtext' in body:
             return ocrtext_query(cur, body['ocrtext'], limit)
 
         elif 'similaritytext' in body and not 'ocrtext' in body and not 'asrtext' in body:
-            inputs = [vectorize_textinput(x) for x in body['similaritytext'].split('#') if x != ""]
+            inputs = vectorize_textinputs([x for x in body['similaritytext'].split('#') if x != ""])
             
             if 'mergetype' not in body:
-                print("no merge")
-                return similaritytext_result_intersection_query(cur, inputs, limit)
+                return similaritytext_result_intersection_query(cur, inputs, limit, body.get('nprobe'))
             
             elif body['mergetype'] == 'id_intersection':
-                print("merge with intersection")
-                return similaritytext_result_intersection_query(cur, inputs, limit)
+                return similaritytext_result_intersection_query(cur, inputs, limit, body.get('nprobe'))
             
             elif body['mergetype'] == 'vector_addition':
-                print("merge with vector addition")
-                return similaritytext_vectoraddition_query(cur, inputs, limit)
+                return similaritytext_vectoraddition_query(cur, inputs, limit, body.get('nprobe'))
         
         elif 'asrtext' in body and not 'similaritytext' in body and not 'ocrtext' in body:
             return asrtext_query(cur, body['asrtext'], limit)
         
         elif 'ocrtext' in body and 'similaritytext' in body and not 'asrtext' in body:
-            cur.execute(
-                f"""
-                    SELECT id, feature <=> %s AS distance
-                    FROM features_openclip
-                    WHERE id IN (
-                        SELECT id 
-                        FROM features_ocr
-                        WHERE feature @@ plainto_tsquery(%s)
-                    )
-                    ORDER BY distance
-                    {limit}
-                """,
-                (similarity_vector, body['ocrtext'])
-            )
-
-        elif 'asrtext' in body and 'similaritytext' in body and 'ocrtext' not in body:
-            asr = [x.segmentid for x in asrtext_query(cur, body['asrtext'], limit)]
-            ids = f"{asr}".replace("[", "").replace("]", "")
-            cur.execute(
-                f"""
-                    SELECT id, feature <=> %s AS distance
-                    FROM features_openclip
-                    WHERE id  IN ({ids})
-                    ORDER BY distance
-                    {limit}
-                """,
-                (vectorize_textinput(body['similaritytext']),)
-            )
-            return evaluate_cursor(cur)
-        
-        elif 'asrtext' in body and 'ocrtext' in body and 'similaritytext' not in body:
-            asr = set([x.segmentid for x in asrtext_query(cur, body['asrtext'], limit)])
-            ocr = set([x.segmentid for x in ocrtext_query(cur, body['ocrtext'], limit)])
-            return [Scoredsegment(segmentid=x, score=1) for x in (asr & ocr)]
-        
-        elif 'asrtext' in body and 'ocrtext' in body and 'similaritytext' in body:
-            asr_ocr = [x.segmentid for x in ocrtext_query(cur, body['ocrtext'], limit) if x in asrtext_query(cur, body['asrtext'], limit)]
-            ids =  f"{asr_ocr}".replace("[", "").replace("]", "")
-
-            inputs = body['similaritytext'].split('#')
-
-            tmp = []
-            for input in inputs:
-                cur.execute(
-                    f"""
-                        SELECT id, feature <=> %s AS distance
-                        FROM features_openclip
-                        WHERE id  IN ({ids})
-                        ORDER BY distance
-                        {limit}
-                    """,
-                    (vectorize_textinput(input),)
-                )   
-                tmp += evaluate_cursor(cur)
-            
-            tmp.sort(key=lambda x: x.segmentid)
-            result = []
-            i = 0
-            while i <= (len(tmp) - len(inputs)):
-                avgElement = [tmp[i].segmentid, tmp[i].score, 1]
-                for j in range((i+1), (len(tmp) - 1 )):
-                    if tmp[i].segmentid == tmp[j].segmentid:
-                        avgElement[1] += tmp[j].score
-                        avgElement[2] += 1
-
-                if avgElement[2] >= len(inputs):
-                    result.append(Scoredsegment(avgElement[0], (avgElement[1] / float(avgElement[2]))))
-                i += avgElement[2]
-            result.sort(key= lambda x: x.score)
-            print("Amount of results " + str(len(result)))
-            return result
-        
+            return ocr_similarity_query(cur, vectorize_textinput(body['similaritytext']), body['ocrtext'], limit)
+
         else:
             return "Not a valid query"
            
 
-# helping functions for query
+def late_fusion_query(body):
+    """Runs one candidate search per similarity text part and per OCR/ASR text concurrently and fuses their ranks."""
+    database = body['database']
+    limit = body.get('limit')
+    texts = [x for x in body.get('similaritytext', '').split('#') if x != ""]
+    modalities = [key for key in ('ocrtext', 'asrtext') if key in body]
+    if not texts and not modalities:
+        return "Not a valid query"
+
+    weights = body.get('weights')
+    if weights is not None and len(weights) != len(texts) + len(modalities):
+        return f"Expected {len(texts) + len(modalities)} weights, one per similarity text part and OCR/ASR text", 400
+
+    # The full-text searches start first, so that they run while the texts are encoded
+    text_queries = {'ocrtext': ocrtext_query, 'asrtext': asrtext_query}
+    text_futures = [parallel.submit(database, text_queries[key], body[key], limit) for key in modalities]
+    knn_futures = [parallel.submit(database, knn_query, vector, limit, body.get('nprobe'))
+                   for vector in vectorize_textinputs(texts)]
+    result_lists = [future.result() for future in knn_futures + text_futures]
+
+    if body['mergetype'] == 'rrf':
+        result = fusion.reciprocal_rank_fusion(result_lists, weights, limit=limit)
+    else:
+        result = fusion.weighted_fusion(result_lists, weights, limit=limit)
+    logger.debug('%s fusion of %d lists found %d results', body['mergetype'], len(result_lists), len(result))
+    return result
+
+def multimodal_query(body):
+    """Runs the combinations with ASR text as a query plan.
+
+    The ASR and OCR searches and the text encoding are independent and run concurrently, each of them once. The
+    similarity search of each text part then runs on the segments found by both full-text searches, without a
+    similarity text these are scored by the mean of their normalized text scores in both.
+    """
+    plan = planner.QueryPlan(body['database'])
+    limit = body.get('limit')
+    plan.query('asr', asrtext_query, body['asrtext'], limit)
+    if 'ocrtext' in body:
+        plan.query('ocr', ocrtext_query, body['ocrtext'], limit)
+        plan.compute('matches', lambda asr, ocr: fusion.fuse([asr, ocr], 'mean'), after=('asr', 'ocr'))
+    else:
+        plan.compute('matches', lambda asr: asr, after=('asr',))
+
+    if 'similaritytext' not in body:
+        return plan.run()['matches']
+
+    plan.compute('ids', lambda matches: [x.segmentid for x in matches], after=('matches',))
+
+    # Only the combination of all three modalities splits the similarity text into parts
+    parts = body['similaritytext'].split('#') if 'ocrtext' in body else [body['similaritytext']]
+    plan.compute('vectors', vectorize_textinputs, parts)
+    for i in range(len(parts)):
+        plan.query(f'similarity{i}', filtered_knn_query, i, limit, after=('vectors', 'ids'))
+    results = plan.run()
+
+    result = fusion.fuse([results[f'similarity{i}'] for i in range(len(parts))], 'mean', len(parts))
+    logger.debug('Multimodal query found %d results', len(result))
+    return result
+
+def filtered_knn_query(cur, index, limit, vectors, ids):
+    return hybrid_knn_query(cur, vectors[index], ids, limit)
+
+def hybrid_knn_query(cur, similarity_vector, ids, limit):
+    """Finds the nearest of the given segments, exactly if they are few and by a filtered index scan otherwise."""
+    local_index = vectorindex.get_index(cur.connection.info.dbname)
+    if local_index is not None:
+        with metrics.span('vectorindex'):
+            return local_index.score(similarity_vector, ids, limit)
+    if hybrid.use_exact_search(len(ids)):
+        return hybrid.exact_search(cur, similarity_vector, ids, limit)
+    return knn_search(cur, 'similarity_in_ids', (similarity_vector, ids, limit), limit, filtered=True,
+                      candidates=len(ids))
+
+def ocr_similarity_query(cur, similarity_vector, input, limit):
+    """Finds the segments most similar to the vector among the ones matching the OCR text.
+
+    Only the IDs of up to HYBRIDEXACTMAX + 1 matches are fetched, if there are more, the full-text match is left to
+    the filter of the index scan.
+    """
+    # All matches found in a text index are re-ranked, see hybrid_knn_query
+    matches = textindex.search(cur, 'features_ocr', input, None)
+    if matches is not None:
+        return hybrid_knn_query(cur, similarity_vector, [x.segmentid for x in matches], limit)
+
+    maximum = None if vectorindex.get_index(cur.connection.info.dbname) else hybrid.get_exact_maximum()
+    textsearch.search_ids(cur, 'features_ocr', input, None if maximum is None else maximum + 1)
+    ids = [segmentid for (segmentid,) in cur.fetchall()]
+    if maximum is None or len(ids) <= maximum:
+        return hybrid_knn_query(cur, similarity_vector, ids, limit)
+    languages = textsearch.get_languages()
+    return knn_search(cur, textsearch.similarity_template('features_ocr', len(languages)),
+                      (similarity_vector, input, limit, *languages), limit, filtered=True)
+
+def knn_query(cur, similarity_vector, limit, nprobe=None):
+    return similaritytext_query(cur, similarity_vector, limit, nprobe)
+
+def knn_search(cur, name, params, limit, filtered=False, candidates=None):
+    """Runs a kNN template with HNSW parameters chosen for its limit and filter, see searchparams.search."""
+    def run(cur):
+        statements.execute(cur, name, params)
+        return evaluate_cursor(cur)
+
+    # SET LOCAL scopes the parameters to this transaction, so that they do not leak to the next user of the pooled
+    # connection
+    return searchparams.search(cur, name, run, limit, filtered, candidates)
+
+def normalize_textinput(input):
+    return ' '.join(unicodedata.normalize('NFC', input).split())
+
 def vectorize_textinput(input):
-    text = tokenizer(input)
-    with torch.no_grad():
-        text_features = model.encode_text(text)
-        text_features /= text_features.norm(dim=-1, keepdim=True)
-        return text_features.cpu().numpy().flatten()
+    return vectorize_textinputs([input])[0]
+
+def vectorize_textinputs(inputs):
+    """Returns the embeddings of several texts, encoding the ones that are not cached yet in a single batch."""
+    encoder = textencoder.get_text_encoder()
+    inputs = [normalize_textinput(x) for x in inputs]
+    vectors = {}
+    missing = []
+    for input in dict.fromkeys(inputs):
+        vector = text_embedding_cache.get((encoder.model_name, input))
+        if vector is None:
+            missing.append(input)
+        else:
+            vectors[input] = vector
+
+    with metrics.span('encode'):
+        encoded = encoder.batcher(missing)
+    for input, vector in zip(missing, encoded):
+        text_embedding_cache.put((encoder.model_name, input), vector)
+        vectors[input] = vector
+
+    return [vectors[x] for x in inputs]
+
+def similaritytext_query(cur, similarity_vector, limit, nprobe=None):
+    local_index = vectorindex.get_index(cur.connection.info.dbname)
+    if local_index is not None:
+        with metrics.span('vectorindex'):
+            return local_index.search(similarity_vector, limit, nprobe=nprobe)
 
-def similaritytext_query(cur, similarity_vector, limit):
     # Get cosine similarity as score
-    cur.execute(
-        f"""
-            SELECT id, feature <=> %s AS distance
-            FROM features_openclip
-            ORDER BY distance
-            {limit}
-        """,
-        (similarity_vector,))
-    
-    return evaluate_cursor(cur)
+    return knn_search(cur, 'similarity', (similarity_vector, limit), limit)
 
-def similaritytext_result_intersection_query(cur, inputs, limit):
-    tmp = [[]]
-    tmp[0] = similaritytext_query(cur, inputs[0], limit)
-    ids = set([x.segmentid for x in tmp[0]])
-
-    if len(inputs) > 1:
-        for input in inputs[1:]:
-            # vector = vectorize_textinput(input)
-            sim = similaritytext_query(cur, input, limit)
-            tmp.append(sim)
-            ids &= set([x.segmentid for x in sim])
-
-        if len(ids) < 10:
-            length = len(tmp)
-            for i in range(length): 
-                id = set([x.segmentid for x in tmp[i]]) - ids
-                id = f"{id}".replace("{", "").replace("}", "")
-                for j in range(len(inputs)):
-                    if i == j: continue
-                    cur.execute(
-                        f"""
-                            SELECT id, feature <=> %s AS distance
-                            FROM features_openclip
-                            WHERE id  IN ({id})
-                            ORDER BY distance
-                            {limit}
-                        """,
-                        (inputs[j],)
-                    )
-                    res = [x for x in evaluate_cursor(cur) if x.score >= 0.17]
-                    # print("length before " + str(len(tmp[i])) + ", " + str(len(res)))
-                    tmp[i] += res
-                    # print('IDs of ' + str(body['similaritytext'].split("#")[i]) + ' Score of ' + str(body['similaritytext'].split("#")[j]) + ' ' + str(len(tmp[i])))
-                
-    tmp = [x for i in range(len(tmp)) for x in tmp[i] ]
-    tmp.sort(key=lambda x: x.segmentid)
-    result = []
-    i = 0
-    while i <= (len(tmp) - len(inputs)):
-        avgElement = [tmp[i].segmentid, tmp[i].score, 1]
-        for j in range((i+1), (len(tmp) - 1 )):
-            if tmp[i].segmentid == tmp[j].segmentid:
-                avgElement[1] += tmp[j].score
-                avgElement[2] += 1
-
-        if avgElement[2] >= len(inputs):
-            result.append(Scoredsegment(avgElement[0], (avgElement[1] / float(avgElement[2]))))
-        i += avgElement[2]
-
-    result.sort(key= lambda x: x.score)
-    print("Amount of results " + str(len(result)))
+def similaritytext_result_intersection_query(cur, inputs, limit, nprobe=None):
+    """Merges the kNN results of several query vectors in a single statement.
+
+    Every input contributes its nearest neighbours as candidates, and each candidate is scored against all inputs in
+    the same statement. Candidates found by all inputs are kept. If fewer than INTERSECTION_MINIMUM of those exist,
+    the other candidates are kept as well if they score at least RESCORE_THRESHOLD against every input that did not
+    find them. The score of a segment is its mean score over all inputs.
+    """
+    if len(inputs) == 1:
+        return similaritytext_query(cur, inputs[0], limit, nprobe)
+
+    local_index = vectorindex.get_index(cur.connection.info.dbname)
+    if local_index is not None:
+        result = local_intersection_query(local_index, inputs, limit, nprobe)
+        logger.debug('id_intersection of %d inputs found %d results', len(inputs), len(result))
+        return result
+
+    result = knn_search(cur, intersection_template(len(inputs)),
+                        (*inputs, limit, len(inputs), INTERSECTION_MINIMUM, 1 - RESCORE_THRESHOLD), limit)
+    logger.debug('id_intersection of %d inputs found %d results', len(inputs), len(result))
     return result
 
-def similaritytext_vectoraddition_query(cur, inputs, limit):
+def intersection_template(n):
+    """Registers the id_intersection statement for n query vectors, see similaritytext_result_intersection_query."""
+    name = f'similarity_intersection_{n}'
+    # $1 to $n are the query vectors, followed by the limit, n, INTERSECTION_MINIMUM and the maximum rescore distance
+    limit, inputs, minimum, max_distance = (f'${n + i}' for i in range(1, 5))
+    per_input = '\n        UNION ALL\n'.join(
+        f"""        (SELECT id, {i} AS input FROM features_openclip ORDER BY feature <=> ${i + 1} LIMIT {limit})"""
+        for i in range(n))
+    found = ', '.join(f'bool_or(input = {i}) AS found{i}' for i in range(n))
+    distances = ', '.join(f'f.feature <=> ${i + 1} AS d{i}' for i in range(n))
+    mean = ' + '.join(f'd{i}' for i in range(n))
+    rescored = ' AND '.join(f'(found{i} OR d{i} <= {max_distance})' for i in range(n))
+    statements.register(name, ', '.join(['vector'] * n + ['bigint', 'integer', 'integer', 'double precision']), f"""
+    WITH candidates AS (
+        SELECT id, COUNT(*) AS hits, {found}
+        FROM (
+{per_input}
+        ) AS per_input
+        GROUP BY id
+    ), scored AS (
+        SELECT c.*, {distances}, COUNT(*) FILTER (WHERE c.hits = {inputs}) OVER () AS common
+        FROM candidates c JOIN features_openclip f ON f.id = c.id
+    )
+    SELECT id, ({mean}) / {inputs} AS distance
+    FROM scored
+    WHERE hits = {inputs} OR (common < {minimum} AND {rescored})
+""")
+    return name
+
+@metrics.timed('vectorindex')
+def local_intersection_query(local_index, inputs, limit, nprobe=None):
+    """The id_intersection merge of similaritytext_result_intersection_query on a local vector index."""
+    per_input = [local_index.nearest(input, limit, nprobe=nprobe)[0] for input in inputs]
+    candidates = np.unique(np.concatenate(per_input))
+    found = np.stack([np.isin(candidates, rows) for rows in per_input], axis=1)
+    scores = local_index.similarities(candidates, inputs)
+
+    common = found.all(axis=1)
+    keep = common
+    if common.sum() < INTERSECTION_MINIMUM:
+        keep = (found | (scores >= RESCORE_THRESHOLD)).all(axis=1)
+    mean = scores[keep].mean(axis=1)
+    order = np.argsort(-mean, kind='stable')
+    return local_index.segments(candidates[keep][order], mean[order])
+
+def similaritytext_vectoraddition_query(cur, inputs, limit, nprobe=None):
     input = np.mean(inputs, axis=0)
-    result = similaritytext_query(cur, input, limit)
-    print("Amount of results " + str(len(result)))
+    result = similaritytext_query(cur, input, limit, nprobe)
+    logger.debug('vector_addition of %d inputs found %d results', len(inputs), len(result))
     return result
 
 def ocrtext_query(cur, input, limit):
-    cur.execute(
-        f"""
-            SELECT id, 0 AS distance
-            FROM features_ocr WHERE feature @@ plainto_tsquery(%s)
-            {limit}
-        """,
-        (input,))
-    
+    """Finds the segments whose OCR text matches best, scored by the ts_rank_cd of the match or BM25 in a text index."""
+    result = textindex.search(cur, 'features_ocr', input, limit)
+    if result is not None:
+        return result
+    textsearch.search(cur, 'features_ocr', input, limit)
     return evaluate_cursor(cur)
 
 def asrtext_query(cur, input, limit):
-    # TODO Implement ASR features
-    # return Scoredsegment(segmentid='dummy_id', score=1)
-    return ocrtext_query(cur, input, limit)
+    """Finds the segments whose transcript matches best, with quoted phrases matched as phrases, see textsearch."""
+    result = textindex.search(cur, 'features_asr', input, limit)
+    if result is not None:
+        return result
+    textsearch.search(cur, 'features_asr', input, limit)
+    return evaluate_cursor(cur)
 
 def evaluate_cursor(cur):
     results = cur.fetchall()
-    scored_segments = [Scoredsegment(segmentid=segmentid, score=1 - distance) for (segmentid, distance) in set(results)]
-    print("Amount of results", len(scored_segments))
+    scored_segments = [rows.ScoredRow(segmentid, 1 - distance) for (segmentid, distance) in set(results)]
+    logger.debug('Statement returned %d results', len(scored_segments))
     scored_segments.sort(key= lambda x: x.score)
     return scored_segments
 
 #######################################################
 
+@metrics.recorded
 def segmentinfo_database_segmentid_get(database, segmentid):  # noqa: E501
     """Get the information of a segment.
 
@@ -333,19 +572,24 @@ def segmentinfo_database_segmentid_get(database, segmentid):  # noqa: E501
 
     :rtype: Union[Multimediasegment, Tuple[Multimediasegment, int], Tuple[Multimediasegment, int, Dict[str, str]]
     """
-    with get_connection(database) as conn:
-        cur = conn.cursor()
-        cur.execute(f"""
-            SELECT segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs 
-            FROM cineast_segment WHERE segmentid = %s
-        """,
-                    (segmentid,))
-        (segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs) = cur.fetchone()
-        return Multimediasegment(segmentid=segmentid, objectid=objectid, segmentnumber=segmentnumber,
-                                 segmentstart=segmentstart, segmentend=segmentend, segmentstartabs=segmentstartabs,
-                                 segmentendabs=segmentendabs)
-
-
+    metadata_cache = metadata.get_cache(database)
+    if metadata_cache is not None:
+        result = next(iter(metadata_cache.segments([segmentid])), None)
+    else:
+        with get_connection(database) as conn:
+            cur = conn.cursor()
+            statements.execute(cur, 'segmentinfo', (segmentid,))
+            result = cur.fetchone()
+
+    if result is None:
+        return {}, 404
+    (segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs) = result
+    return Multimediasegment(segmentid=segmentid, objectid=objectid, segmentnumber=segmentnumber,
+                             segmentstart=segmentstart, segmentend=segmentend, segmentstartabs=segmentstartabs,
+                             segmentendabs=segmentendabs)
+
+
+@metrics.recorded
 def segmentinfos_post(body):  # noqa: E501
     """Get the information of multiple segments.
 
@@ -356,27 +600,29 @@ def segmentinfos_post(body):  # noqa: E501
 
     :rtype: Union[List[Multimediasegment], Tuple[List[Multimediasegment], int], Tuple[List[Multimediasegment], int, Dict[str, str]]
     """
+    metadata_cache = metadata.get_cache(body['database'])
+    if metadata_cache is not None:
+        segment_infos = metadata_cache.segments(body['segmentids'])
+        if streaming.requested():
+            return streaming.response(streaming.batched_lines(segment_infos))
+        return rows.response(segment_infos)
+
+    if streaming.requested():
+        return streaming.response(stream_rows(body['database'], 'segmentinfos', (body['segmentids'],),
+                                              rows.SegmentRow))
+
     with get_connection(body['database']) as conn:
         cur = conn.cursor()
-        cur.execute(
-            f"""
-                SELECT segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs  
-                FROM cineast_segment WHERE segmentid = ANY(%s)""",
-            (body['segmentids'],))
-        results = cur.fetchall()
-
-    segment_infos = [Multimediasegment(segmentid=segmentid, objectid=objectid, segmentnumber=segmentnumber,
-                                       segmentstart=segmentstart, segmentend=segmentend,
-                                       segmentstartabs=segmentstartabs,
-                                       segmentendabs=segmentendabs) for
-                     (segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs) in
-                     results]
+        statements.execute(cur, 'segmentinfos', (body['segmentids'],))
+        segment_infos = list(map(rows.SegmentRow._make, cur.fetchall()))
 
-    return segment_infos
+    return rows.response(segment_infos)
 
 
+@metrics.recorded
+@searchparams.recorded
 def querybyexample_post(body):  # noqa: E501
-    """Get the nearest neighbors of a segment.
+    """Get the nearest neighbors of one or more segments.
 
      # noqa: E501
 
@@ -385,40 +631,112 @@ def querybyexample_post(body):  # noqa: E501
 
     :rtype: Union[List[Scoredsegment], Tuple[List[Scoredsegment], int], Tuple[List[Scoredsegment], int, Dict[str, str]]
     """
-    with get_connection(body['database']) as conn:
+    include = body.get('include', [])
+    if any(x not in INCLUDES for x in include):
+        return f"Unknown include, expected some of {', '.join(INCLUDES)}", 400
+    seeds = list(dict.fromkeys(([body['segmentid']] if 'segmentid' in body else []) + body.get('segmentids', [])))
+    if not seeds:
+        return "Expected a segmentid or segmentids", 400
+    mergetype = body.get('mergetype', 'centroid')
+    if mergetype not in EXAMPLE_MERGETYPES:
+        return f"Unknown merge type {mergetype}, expected one of {', '.join(EXAMPLE_MERGETYPES)}", 400
+    metrics.annotate(mergetype=mergetype)
+    if body.get('nprobe', 1) < 1:
+        return "Expected an nprobe of at least 1", 400
+
+    database = body['database']
+    limit = body.get('limit')
+    if limit is not None and limit < 1:
+        return "Expected a limit of at least 1", 400
+    exclude = list(dict.fromkeys(seeds + body.get('exclude', [])))
+    with get_connection(database) as conn:
         cur = conn.cursor()
-        cur.execute('CREATE EXTENSION IF NOT EXISTS vector')
-        register_vector(conn)
-
-        limit = f'LIMIT {body["limit"]}' if 'limit' in body else ''
-
-        if 'limit' in body:
-            cur.execute('SET hnsw.ef_search = %s', (body['limit'],))
-
-        cur.execute(
-            f"""
-            WITH query_feature AS (
-                SELECT feature 
-                FROM features_openclip 
-                WHERE id = %s 
-                LIMIT 1
-            )
-            SELECT 
-                id, 
-                (feature <=> (SELECT feature FROM query_feature)) AS distance
-            FROM features_openclip
-            WHERE id != %s
-            ORDER BY distance
-            {limit}
-            """,
-            (body['segmentid'], body['segmentid'])
-        )
-
-        results = cur.fetchall()
-        scored_segments = [Scoredsegment(segmentid=segmentid, score=1 - distance) for (segmentid, distance) in results]
-    return scored_segments
+        vectors = segment_vectors(cur, seeds)
+        if not vectors:
+            return []
+        if mergetype == 'centroid' or len(vectors) == 1:
+            # Cosine similarity ignores the length of the query, so a single seed is searched as it is
+            centroid = np.mean([vector / np.linalg.norm(vector) for vector in vectors], axis=0)
+            result = example_knn_query(cur, centroid, exclude, limit, body.get('nprobe'))
+
+    if mergetype == 'rrf' and len(vectors) > 1:
+        futures = [parallel.submit(database, example_knn_query, vector, exclude, limit, body.get('nprobe'))
+                   for vector in vectors]
+        result = fusion.reciprocal_rank_fusion([future.result() for future in futures], limit=limit)
+
+    # Best first, unlike the other queries
+    result = include_metadata(database, result[::-1], include)
+    metrics.annotate(results=len(result))
+    if streaming.requested():
+        return streaming.response(streaming.batched_lines(result))
+    return rows.response(result)
+
+def segment_vectors(cur, segmentids):
+    """Returns the features of the segments that exist, taken from segment_embedding_cache or fetched together."""
+    database = cur.connection.info.dbname
+    vectors = {}
+    missing = []
+    for segmentid in segmentids:
+        vector = segment_embedding_cache.get((database, segmentid))
+        if vector is None:
+            missing.append(segmentid)
+        else:
+            vectors[segmentid] = vector
+
+    if missing:
+        local_index = vectorindex.get_index(database)
+        if local_index is not None:
+            fetched = [(segmentid, local_index.vector(segmentid)) for segmentid in missing]
+        else:
+            fetched = zip(*hybrid.fetch_vectors(cur, missing))
+        for segmentid, vector in fetched:
+            if vector is not None:
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                segment_embedding_cache.put((database, segmentid), vector)
+                vectors[segmentid] = vector
+
+    return [vectors[x] for x in segmentids if x in vectors]
+
+def example_knn_query(cur, vector, exclude, limit, nprobe=None):
+    local_index = vectorindex.get_index(cur.connection.info.dbname)
+    if local_index is not None:
+        with metrics.span('vectorindex'):
+            return local_index.search(vector, limit, exclude=exclude, nprobe=nprobe)
+    # All segments but the excluded ones pass the filter
+    info = bootstrap.get_database_info(cur.connection, cur.connection.info.dbname)
+    candidates = info.feature_count - len(exclude) if info.feature_count else None
+    return knn_search(cur, 'similarity_excluding', (vector, exclude, limit), limit, filtered=True,
+                      candidates=candidates)
+
+
+def metrics_get():  # noqa: E501
+    """Get the request, statement, cache and pool metrics in the Prometheus text format.
+
+     # noqa: E501
 
 
+    :rtype: Union[str, Tuple[str, int], Tuple[str, int, Dict[str, str]]
+    """
+    return metrics.response()
+
+
+def ready_get():  # noqa: E501
+    """Check whether the engine is ready to serve queries.
+
+     # noqa: E501
+
+
+    :rtype: Union[ReadyGet200Response, Tuple[ReadyGet200Response, int], Tuple[ReadyGet200Response, int, Dict[str, str]]
+    """
+    encoder = textencoder.get_text_encoder()
+    response = ReadyGet200Response(ready=encoder.ready, model=encoder.model_name)
+    if not encoder.ready:
+        return response, 503
+    return response
+
+
+@metrics.recorded
 def segmentbytime_post(body):  # noqa: E501
     """Get the segment ID for a given timestamp and object.
 
@@ -429,21 +747,66 @@ def segmentbytime_post(body):  # noqa: E501
 
     :rtype: Union[SegmentbytimePost200Response, Tuple[SegmentbytimePost200Response, int], Tuple[SegmentbytimePost200Response, int, Dict[str, str]]
     """
-    with get_connection(body['database']) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT segmentid 
-            FROM cineast_segment 
-            WHERE objectid = %s 
-            AND %s BETWEEN segmentstartabs AND segmentendabs;
-            """,
-            (body['objectid'], body['timestamp'])
-        )
-
-        result = cur.fetchone()
+    metadata_cache = metadata.get_cache(body['database'])
+    if metadata_cache is not None:
+        segmentid = metadata_cache.segment_at(body['objectid'], body['timestamp'])
+        result = None if segmentid is None else (segmentid,)
+    else:
+        with get_connection(body['database']) as conn:
+            cur = conn.cursor()
+            statements.execute(cur, 'segmentbytime', (body['objectid'], body['timestamp']))
+
+            result = cur.fetchone()
 
     if result:
         return SegmentbytimePost200Response(segmentid=result[0])
 
     return {}, 404  # No matching segment found
+
+
+@metrics.recorded
+def segmentsbytime_post(body):  # noqa: E501
+    """Get the segment IDs for several timestamps and objects.
+
+     # noqa: E501
+
+    :param segmentsbytime_post_request:
+    :type segmentsbytime_post_request: dict | bytes
+
+    :rtype: Union[List[SegmentbytimePost200Response], Tuple[List[SegmentbytimePost200Response], int], Tuple[List[SegmentbytimePost200Response], int, Dict[str, str]]
+    """
+    objectids = [x['objectid'] for x in body['timestamps']]
+    timestamps = [x['timestamp'] for x in body['timestamps']]
+
+    metadata_cache = metadata.get_cache(body['database'])
+    if metadata_cache is not None:
+        segmentids = metadata_cache.segments_at(objectids, timestamps)
+    else:
+        with get_connection(body['database']) as conn:
+            cur = conn.cursor()
+            statements.execute(cur, 'segmentsbytime', (objectids, timestamps))
+            segmentids = [segmentid for (segmentid,) in cur.fetchall()]
+
+    return rows.json_response([{} if segmentid is None else {'segmentid': segmentid} for segmentid in segmentids])
+
+
+@metrics.recorded
+def textindex_database_refresh_post(database, body=None):  # noqa: E501
+    """Index the OCR and ASR text of a database again, completely or only some segments.
+
+     # noqa: E501
+
+    :param database: The name of the database to index the text of.
+    :type database: str
+    :param textindex_database_refresh_post_request:
+    :type textindex_database_refresh_post_request: dict | bytes
+
+    :rtype: Union[TextindexDatabaseRefreshPost200Response, Tuple[TextindexDatabaseRefreshPost200Response, int], Tuple[TextindexDatabaseRefreshPost200Response, int, Dict[str, str]]
+    """
+    if textindex.get_backend(database) != 'local':
+        return "No text index is configured for the database", 400
+
+    indexes = textindex.refresh(database, (body or {}).get('segmentids'))
+    # Cached rankings may contain the old text matches
+    resultcache.invalidate(database)
+    return TextindexDatabaseRefreshPost200Response(ocr=len(indexes['features_ocr']), asr=len(indexes['features_asr']))
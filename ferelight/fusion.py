@@ -0,0 +1,120 @@
+from ferelight import metrics
+from ferelight.rows import ScoredRow
+
+FUSION_METHODS = ('mean', 'min', 'sum')
+
+
+@metrics.timed('fusion')
+def fuse(result_lists, method='mean', min_count=None):
+    """Merges several lists of scored segments into one list with one score per segment.
+
+    The scores of a segment are grouped by its ID in a single pass over all lists and aggregated with ``method``.
+    Segments that occur fewer than ``min_count`` times are dropped, by default a segment has to occur once per list.
+
+    :param result_lists: Lists of scored segments, e.g. one per query input.
+    :type result_lists: List[List[ScoredRow]]
+    :param method: One of ``mean``, ``min`` and ``sum``.
+    :type method: str
+    :param min_count: The minimum number of scores a segment needs to be kept.
+    :type min_count: int
+
+    :return: The fused segments, sorted by ascending score.
+    :rtype: List[ScoredRow]
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f'Unknown fusion method {method}, expected one of {", ".join(FUSION_METHODS)}')
+    if min_count is None:
+        min_count = len(result_lists)
+
+    # segment ID -> [sum, min, count]
+    groups = {}
+    for results in result_lists:
+        for segment in results:
+            group = groups.get(segment.segmentid)
+            if group is None:
+                groups[segment.segmentid] = [segment.score, segment.score, 1]
+            else:
+                group[0] += segment.score
+                group[1] = min(group[1], segment.score)
+                group[2] += 1
+
+    fused = []
+    for segmentid, (total, minimum, count) in groups.items():
+        if count < min_count:
+            continue
+        if method == 'mean':
+            score = total / count
+        elif method == 'min':
+            score = minimum
+        else:
+            score = total
+        fused.append(ScoredRow(segmentid, score))
+
+    fused.sort(key=lambda x: x.score)
+    return fused
+
+
+@metrics.timed('fusion')
+def reciprocal_rank_fusion(result_lists, weights=None, k=60, limit=None):
+    """Combines ranked result lists by reciprocal rank fusion.
+
+    A segment at rank ``r`` (starting at 1) of list ``i`` contributes ``weights[i] / (k + r)`` to its score. Only
+    the ranks are used, so lists with incomparable scores, like full-text matches and cosine similarities, can be
+    combined directly.
+
+    :param result_lists: Lists of scored segments, e.g. one per query input or modality.
+    :type result_lists: List[List[ScoredRow]]
+    :param weights: One weight per list, 1 by default.
+    :type weights: List[float]
+    :param k: Damping constant that limits the influence of the top ranks.
+    :type k: int
+    :param limit: Number of best segments to keep, all if not given.
+    :type limit: int
+
+    :return: The fused segments, sorted by ascending score.
+    :rtype: List[ScoredRow]
+    """
+    weights = _check_weights(result_lists, weights)
+    scores = {}
+    for results, weight in zip(result_lists, weights):
+        ranked = sorted(results, key=lambda x: x.score, reverse=True)
+        for rank, segment in enumerate(ranked, start=1):
+            scores[segment.segmentid] = scores.get(segment.segmentid, 0.0) + weight / (k + rank)
+    return _top(scores, limit)
+
+
+@metrics.timed('fusion')
+def weighted_fusion(result_lists, weights=None, limit=None):
+    """Combines result lists by a weighted sum of their scores, a segment missing from a list scores 0 in it.
+
+    :param result_lists: Lists of scored segments, e.g. one per query input or modality.
+    :type result_lists: List[List[ScoredRow]]
+    :param weights: One weight per list, 1 by default.
+    :type weights: List[float]
+    :param limit: Number of best segments to keep, all if not given.
+    :type limit: int
+
+    :return: The fused segments, sorted by ascending score.
+    :rtype: List[ScoredRow]
+    """
+    weights = _check_weights(result_lists, weights)
+    scores = {}
+    for results, weight in zip(result_lists, weights):
+        for segment in results:
+            scores[segment.segmentid] = scores.get(segment.segmentid, 0.0) + weight * segment.score
+    return _top(scores, limit)
+
+
+def _check_weights(result_lists, weights):
+    if weights is None:
+        return [1.0] * len(result_lists)
+    if len(weights) != len(result_lists):
+        raise ValueError(f'Expected {len(result_lists)} weights, got {len(weights)}')
+    return weights
+
+
+def _top(scores, limit):
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if limit is not None:
+        best = best[:limit]
+    return [ScoredRow(segmentid, score) for (segmentid, score) in reversed(best)]
@@ -0,0 +1,55 @@
+import numpy as np
+from flask import current_app, has_app_context
+
+from ferelight import searchparams
+from ferelight import statements
+from ferelight.rows import ScoredRow
+
+# Candidate sets up to this size are re-ranked exactly instead of searched with a filtered index scan
+DEFAULT_EXACT_MAXIMUM = 2000
+
+
+def get_exact_maximum():
+    config = current_app.config if has_app_context() else {}
+    return config.get('HYBRIDEXACTMAX', DEFAULT_EXACT_MAXIMUM)
+
+
+def use_exact_search(candidates):
+    """Whether ``candidates`` segments are few enough to score them all instead of scanning the HNSW index.
+
+    A filtered index scan has to visit about ``limit / selectivity`` vectors to return ``limit`` of the candidates,
+    which for a small candidate set is far more than the candidates themselves, and may still miss some of them.
+    """
+    return candidates <= get_exact_maximum()
+
+
+def fetch_vectors(cur, segmentids):
+    """Fetches the features of the given segments in one statement and returns their IDs and a float32 matrix."""
+    statements.execute(cur, 'vectors_in_ids', (list(segmentids),))
+    rows = cur.fetchall()
+    if not rows:
+        return [], np.empty((0, 0), dtype=np.float32)
+    # The binary format of a vector is a 2-byte dimension and 2 unused bytes followed by big-endian float4 values, so
+    # that the header of each row takes the place of one extra column
+    data = np.frombuffer(b''.join(bytes(feature) for (_, feature) in rows), dtype='>f4')
+    return [segmentid for (segmentid, _) in rows], data.reshape(len(rows), -1)[:, 1:].astype(np.float32)
+
+
+def exact_search(cur, vector, segmentids, limit):
+    """Scores all given segments against ``vector`` and returns the ``limit`` best by ascending score."""
+    parameters = searchparams.SearchParameters('exact', limit, None, None, False)
+    parameters.attempts = 1
+    segmentids, matrix = fetch_vectors(cur, segmentids)
+    if not segmentids:
+        parameters.results = 0
+        searchparams.record(parameters)
+        return []
+
+    vector = np.asarray(vector, dtype=np.float32)
+    # Cosine similarity, which pgvector returns as 1 - distance. All-zero features or queries score 0 instead of NaN.
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    scores = matrix @ vector / np.maximum(norms, np.finfo(np.float32).tiny)
+    order = np.argsort(-scores, kind='stable')[:limit]
+    parameters.results = len(order)
+    searchparams.record(parameters)
+    return [ScoredRow(segmentids[i], float(scores[i])) for i in reversed(order)]
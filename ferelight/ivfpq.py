@@ -0,0 +1,171 @@
+import logging
+import os
+import time
+
+import numpy as np
+
+from ferelight.vectorindex import LocalVectorIndex, _normalize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NPROBE = 16
+# Candidates re-ranked with the exact vectors per requested result
+RERANK_FACTOR = 4
+TRAINING_SAMPLE = 100000
+# Rows assigned to centroids per matrix product during training and encoding
+ASSIGN_BLOCK_SIZE = 16384
+
+
+class IVFPQIndex(LocalVectorIndex):
+    """An inverted file index with product-quantized residuals over an exported vector index.
+
+    The vectors are clustered into ``nlist`` inverted lists by spherical k-means. Within a list, the residual of each
+    vector to its list centroid is split into ``m`` sub-vectors, and each sub-vector is stored as the one-byte code of
+    its nearest centroid in a per-subspace codebook. A query scores the ``nprobe`` lists whose centroids are most
+    similar to it by table lookups on the codes, and the best candidates are re-ranked with the exact vectors of the
+    memory-mapped export, so that scores are the same as for the exact index.
+
+    Only the codes and codebooks are held in memory, ``m`` bytes per vector instead of 2 or 4 bytes per dimension.
+    """
+
+    def __init__(self, directory, database, nprobe=DEFAULT_NPROBE):
+        super().__init__(directory, database)
+        with np.load(os.path.join(directory, database + '.ivfpq.npz')) as data:
+            self.centroids = data['centroids']
+            self.codebooks = data['codebooks']
+            self.codes = data['codes']
+            self.list_rows = data['rows']
+            self.offsets = data['offsets']
+        if len(self.codes) != len(self):
+            raise ValueError(f'IVF-PQ index of database {database} has {len(self.codes)} codes for {len(self)} '
+                             f'vectors, it has to be built again after the export')
+        self.nprobe = nprobe
+
+    def nearest(self, query, limit=None, exclude=None, nprobe=None):
+        """Returns the rows of the ``limit`` vectors most similar to ``query`` and their scores, best first.
+
+        :param nprobe: The number of inverted lists to search, more lists find more of the true nearest neighbours
+            at the cost of latency. The index default is used if not given.
+        """
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        if nprobe is not None and nprobe < 1:
+            raise ValueError(f'Expected an nprobe of at least 1, got {nprobe}')
+        nprobe = min(self.nprobe if nprobe is None else nprobe, len(self.centroids))
+
+        list_scores = self.centroids @ query
+        probed = np.argpartition(list_scores, -nprobe)[-nprobe:]
+        sizes = np.diff(self.offsets)[probed]
+        candidates = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probed])
+        # The inner product with a vector is the one with its centroid plus the ones with its quantized residuals
+        centroid_scores = np.repeat(list_scores[probed], sizes)
+        if exclude:
+            keep = ~np.isin(self.list_rows[candidates], self.rows(exclude))
+            candidates, centroid_scores = candidates[keep], centroid_scores[keep]
+
+        if limit is not None and limit * RERANK_FACTOR < len(candidates):
+            m, _, dsub = self.codebooks.shape
+            tables = np.einsum('jkd,jd->jk', self.codebooks, query.reshape(m, dsub))
+            approximate = centroid_scores + tables[np.arange(m), self.codes[candidates]].sum(axis=1)
+            candidates = candidates[np.argpartition(approximate, -limit * RERANK_FACTOR)[-limit * RERANK_FACTOR:]]
+
+        rows = np.sort(self.list_rows[candidates])
+        scores = self.similarities(rows, [query])[:, 0]
+        order = np.argsort(-scores, kind='stable')[:limit]
+        return rows[order], scores[order]
+
+
+def kmeans(data, k, iterations, rng, spherical=False):
+    """Clusters the rows of data with Lloyd's algorithm, by cosine similarity if spherical and Euclidean otherwise."""
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(data, centroids, spherical)
+        counts = np.bincount(assignment, minlength=k)
+        empty = counts == 0
+        # Sums the rows of each cluster in one pass over the rows sorted by cluster
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[~empty]
+        centroids[~empty] = np.add.reduceat(data[order], starts, axis=0) / counts[~empty, None]
+        # Empty clusters restart at random rows
+        centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+        if spherical:
+            centroids = _normalize(centroids)
+    return centroids
+
+
+def assign(data, centroids, spherical=False):
+    """Returns the index of the nearest centroid of every row of data."""
+    # For Euclidean distances, argmin |x - c|^2 = argmax x.c - |c|^2 / 2
+    offset = 0 if spherical else (centroids ** 2).sum(axis=1) / 2
+    assignment = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), ASSIGN_BLOCK_SIZE):
+        block = np.asarray(data[start:start + ASSIGN_BLOCK_SIZE], dtype=np.float32)
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T - offset, axis=1)
+    return assignment
+
+
+def build_index(directory, database, nlist=None, m=None, iterations=20, seed=0):
+    """Builds the IVF-PQ index of an exported vector index and saves it as ``<directory>/<database>.ivfpq.npz``.
+
+    :param nlist: The number of inverted lists, 4 * sqrt(number of vectors) by default.
+    :param m: The number of sub-vectors per vector, one per 8 dimensions by default. Has to divide the dimension.
+    :return: The number of encoded vectors.
+    """
+    base = LocalVectorIndex(directory, database)
+    n, dimensions = base.vectors.shape
+    nlist = min(nlist or max(1, int(4 * np.sqrt(n))), n)
+    m = m or max(1, dimensions // 8)
+    if dimensions % m:
+        raise ValueError(f'{m} sub-vectors do not divide the dimension {dimensions}')
+    dsub = dimensions // m
+    ksub = min(256, n)
+
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(base.vectors[np.sort(rng.choice(n, min(n, TRAINING_SAMPLE), replace=False))],
+                        dtype=np.float32)
+    centroids = kmeans(sample, nlist, iterations, rng, spherical=True)
+    residuals = sample - centroids[assign(sample, centroids, spherical=True)]
+    codebooks = np.stack([kmeans(residuals[:, j * dsub:(j + 1) * dsub], ksub, iterations, rng) for j in range(m)])
+
+    lists = assign(base.vectors, centroids, spherical=True)
+    codes = np.empty((n, m), dtype=np.uint8)
+    for start in range(0, n, ASSIGN_BLOCK_SIZE):
+        block = np.asarray(base.vectors[start:start + ASSIGN_BLOCK_SIZE], dtype=np.float32)
+        residual = block - centroids[lists[start:start + len(block)]]
+        for j in range(m):
+            codes[start:start + len(block), j] = assign(residual[:, j * dsub:(j + 1) * dsub], codebooks[j])
+
+    # Codes are stored grouped by inverted list, rows maps them back to the rows of the export
+    rows = np.argsort(lists, kind='stable')
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=nlist))))
+    path = os.path.join(directory, database + '.ivfpq.tmp.npz')
+    np.savez(path, centroids=centroids, codebooks=codebooks, codes=codes[rows], rows=rows, offsets=offsets)
+    os.replace(path, os.path.join(directory, database + '.ivfpq.npz'))
+    logger.info('Built IVF-PQ index of database %s with %d lists and %d bytes per vector', database, nlist, m)
+    return n
+
+
+def recall_report(directory, database, nprobes, queries=100, limit=100, seed=0):
+    """Measures recall@limit and latency of the IVF-PQ index against exact search for several values of nprobe.
+
+    Stored vectors are used as queries.
+
+    :return: One ``(nprobe, recall, mean milliseconds)`` tuple per value of nprobe, and the mean milliseconds of the
+        exact search.
+    """
+    index = IVFPQIndex(directory, database)
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(index), min(queries, len(index)), replace=False)
+    query_vectors = [np.asarray(index.vectors[row], dtype=np.float32) for row in query_rows]
+
+    start = time.perf_counter()
+    exact = [set(LocalVectorIndex.nearest(index, query, limit)[0]) for query in query_vectors]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+
+    report = []
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [set(index.nearest(query, limit, nprobe=nprobe)[0]) for query in query_vectors]
+        ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+        recall = np.mean([len(f & e) / len(e) for f, e in zip(found, exact)])
+        report.append((nprobe, float(recall), ms))
+    return report, exact_ms
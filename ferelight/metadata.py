@@ -0,0 +1,235 @@
+import bisect
+import itertools
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from ferelight import pool
+from ferelight import statements
+from ferelight.rows import ObjectRow, SegmentRow
+
+logger = logging.getLogger(__name__)
+
+_caches = {}
+_loading = set()
+_lock = threading.Lock()
+
+
+def _column(values, dtype):
+    """Returns the values as an array of ``dtype``, or of Python objects if some are null."""
+    try:
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return np.array(values, dtype=object)
+
+
+def _find(ids, keys):
+    """Returns the positions of the keys in a sorted byte string array, -1 for the ones that are not in it."""
+    keys = np.array([key.encode() for key in keys], dtype=bytes)
+    if not len(ids) or not len(keys):
+        return np.full(len(keys), -1)
+    # Keys longer than the IDs are cut to their length for the search, comparing the full keys rules them out
+    positions = np.minimum(np.searchsorted(ids, keys.astype(ids.dtype)), len(ids) - 1)
+    return np.where(ids[positions] == keys, positions, -1)
+
+
+def _decode(ids):
+    return [x.decode() for x in ids.tolist()]
+
+
+def _scalars(column):
+    """Returns the Python values of a column, with NaN turned back into null."""
+    values = column.tolist()
+    if column.dtype.kind == 'f':
+        return [None if value != value else value for value in values]
+    return values
+
+
+class IntervalIndex:
+    """The segments of one object ordered by their start, with the running maximum of their ends for bisect lookups."""
+
+    __slots__ = ('segmentids', 'starts', 'max_ends')
+
+    def __init__(self, segmentids, starts, ends):
+        self.segmentids = segmentids
+        # Segments without a start or end never include a timestamp, like BETWEEN with null
+        self.starts = [math.inf if start is None else start for start in starts]
+        self.max_ends = list(itertools.accumulate((-math.inf if end is None else end for end in ends), max))
+
+    def find(self, timestamp):
+        """Returns the ID of the first segment whose start and end include ``timestamp``, or None."""
+        # Only the segments starting up to the timestamp can include it, and the first of them that ends at or after
+        # it is the first one whose running maximum end reaches it
+        end = bisect.bisect_right(self.starts, timestamp)
+        position = bisect.bisect_left(self.max_ends, timestamp, 0, end)
+        return self.segmentids[position] if position < end else None
+
+
+class MetadataCache:
+    """The objects and segments of a database in columnar arrays.
+
+    Objects and segments are sorted by their IDs, which are stored as byte strings and looked up by binary search.
+    ``by_object`` lists the segments grouped by object and ordered by their start, so that the segments of the object
+    at position i are ``by_object[offsets[i]:offsets[i + 1]]``.
+    """
+
+    def __init__(self, objects, segments):
+        object_ids = {row[0] for row in objects} | {row[1] for row in segments}
+        self.object_ids = np.array(sorted(x.encode() for x in object_ids), dtype=bytes)
+        # Segments can refer to objects without a row in cineast_multimediaobject
+        self.object_known = np.zeros(len(self.object_ids), dtype=bool)
+        self.mediatypes = np.empty(len(self.object_ids), dtype=object)
+        self.names = np.empty(len(self.object_ids), dtype=object)
+        self.paths = np.empty(len(self.object_ids), dtype=object)
+        if objects:
+            positions = _find(self.object_ids, [row[0] for row in objects])
+            self.object_known[positions] = True
+            self.mediatypes[positions] = [row[1] for row in objects]
+            self.names[positions] = [row[2] for row in objects]
+            self.paths[positions] = [row[3] for row in objects]
+
+        columns = list(zip(*segments)) or [()] * len(SegmentRow._fields)
+        segment_ids = np.array([x.encode() for x in columns[0]], dtype=bytes)
+        order = np.argsort(segment_ids, kind='stable')
+        self.segment_ids = segment_ids[order]
+        self.segment_objects = _find(self.object_ids, columns[1]).astype(np.int32)[order]
+        self.segmentnumbers = _column(columns[2], np.int32)[order]
+        self.segmentstarts = _column(columns[3], np.int64)[order]
+        self.segmentends = _column(columns[4], np.int64)[order]
+        self.segmentstartabs = _column(columns[5], np.float64)[order]
+        self.segmentendabs = _column(columns[6], np.float64)[order]
+
+        self.by_object = np.lexsort((self.segmentstartabs, self.segment_objects)).astype(np.int32)
+        self.offsets = np.searchsorted(self.segment_objects[self.by_object], np.arange(len(self.object_ids) + 1))
+        # Interval indexes by object position, built on the first lookup of a time in the object
+        self._intervals = {}
+
+    @property
+    def object_count(self):
+        return int(self.object_known.sum())
+
+    @property
+    def segment_count(self):
+        return len(self.segment_ids)
+
+    def objects(self, objectids):
+        """Returns the objects with the given IDs that exist, in the given order without duplicates."""
+        positions = [position for position in dict.fromkeys(_find(self.object_ids, objectids).tolist())
+                     if position >= 0 and self.object_known[position]]
+        positions = np.array(positions, dtype=np.int64)
+        return list(map(ObjectRow, _decode(self.object_ids[positions]), self.mediatypes[positions].tolist(),
+                        self.names[positions].tolist(), self.paths[positions].tolist()))
+
+    def segments(self, segmentids):
+        """Returns the segments with the given IDs that exist, in the given order without duplicates."""
+        positions = [position for position in dict.fromkeys(_find(self.segment_ids, segmentids).tolist())
+                     if position >= 0]
+        return self._segment_rows(np.array(positions, dtype=np.int64))
+
+    def object_segments(self, objectid):
+        """Returns the segments of an object, ordered by their start."""
+        position = _find(self.object_ids, [objectid])[0]
+        if position < 0:
+            return []
+        return self._segment_rows(self.by_object[self.offsets[position]:self.offsets[position + 1]])
+
+    def segment_at(self, objectid, timestamp):
+        """Returns the ID of the first segment of an object whose absolute start and end include ``timestamp``."""
+        return self.segments_at([objectid], [timestamp])[0]
+
+    def segments_at(self, objectids, timestamps):
+        """Returns the segment ID of each object and timestamp pair like segment_at, None where there is none."""
+        result = []
+        for position, timestamp in zip(_find(self.object_ids, objectids).tolist(), timestamps):
+            result.append(None if position < 0 else self.interval_index(position).find(timestamp))
+        return result
+
+    def interval_index(self, position):
+        """Returns the interval index of the object at ``position``."""
+        index = self._intervals.get(position)
+        if index is None:
+            rows = self.by_object[self.offsets[position]:self.offsets[position + 1]]
+            index = IntervalIndex(_decode(self.segment_ids[rows]), _scalars(self.segmentstartabs[rows]),
+                                  _scalars(self.segmentendabs[rows]))
+            self._intervals[position] = index
+        return index
+
+    def _segment_rows(self, rows):
+        objectids = _decode(self.object_ids[self.segment_objects[rows]])
+        return list(map(SegmentRow, _decode(self.segment_ids[rows]), objectids,
+                        _scalars(self.segmentnumbers[rows]), _scalars(self.segmentstarts[rows]),
+                        _scalars(self.segmentends[rows]), _scalars(self.segmentstartabs[rows]),
+                        _scalars(self.segmentendabs[rows])))
+
+
+def load(database):
+    """Reads all objects and segments of a database in batches from server-side cursors."""
+    start = time.perf_counter()
+    with pool.get_connection(database) as conn:
+        objects = [row for batch in statements.stream(conn, 'allobjects', size=10000) for row in batch]
+        segments = [row for batch in statements.stream(conn, 'allsegments', size=10000) for row in batch]
+    cache = MetadataCache(objects, segments)
+    logger.info('Loaded %d objects and %d segments of database %s in %.2f s', cache.object_count,
+                cache.segment_count, database, time.perf_counter() - start)
+    return cache
+
+
+def enabled():
+    return has_app_context() and current_app.config.get('METADATACACHE', True)
+
+
+def get_cache(database):
+    """Returns the metadata of a database, loading it on first use, or None to read it from the database.
+
+    None is also returned while another request loads the metadata, and after loading failed until the next refresh.
+    """
+    if database in _caches:
+        return _caches[database]
+    if not enabled():
+        return None
+
+    with _lock:
+        if database in _caches or database in _loading:
+            return _caches.get(database)
+        _loading.add(database)
+    cache = None
+    try:
+        cache = load(database)
+    except Exception:
+        logger.exception('Could not load the metadata of database %s, reading it from the database until it is '
+                         'refreshed', database)
+    finally:
+        with _lock:
+            _loading.discard(database)
+            _caches[database] = cache
+    return cache
+
+
+def refresh(database):
+    """Loads the metadata of a database again, the previous metadata is used until the new one is loaded."""
+    cache = load(database)
+    with _lock:
+        _caches[database] = cache
+    return cache
+
+
+def load_databases(databases):
+    """Loads the metadata of the given databases at startup."""
+    for database in databases:
+        try:
+            refresh(database)
+        except Exception:
+            logger.exception('Could not load the metadata of database %s, loading it when it is first used', database)
+
+
+def invalidate(database=None):
+    """Drops the metadata of one or all databases, so that it is loaded again on its next use."""
+    with _lock:
+        if database is None:
+            _caches.clear()
+        else:
+            _caches.pop(database, None)
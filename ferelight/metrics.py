@@ -0,0 +1,249 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import math
+import random
+import threading
+import time
+
+from flask import Response, current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds of the histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Share of requests that are logged, requests that take at least LOGSLOWSECONDS are always logged
+LOG_DEFAULTS = {
+    'LOGSAMPLERATE': 1.0,
+    'LOGSLOWSECONDS': 1.0,
+}
+
+_record = contextvars.ContextVar('ferelight_request_record', default=None)
+_caches = {}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A histogram of durations in seconds with one series per combination of label values."""
+
+    def __init__(self, name, description, labels, buckets=BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket and one for larger values, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *values):
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+    def render(self):
+        """Returns the lines of the histogram in the Prometheus text format, with cumulative buckets."""
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((values, list(counts), total) for values, (counts, total) in self._series.items())
+        for values, counts, total in series:
+            labels = _labels(self.labels, values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{_number(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {_number(total)}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('ferelight_request_seconds', 'Time to answer a request.', ('endpoint', 'mergetype'))
+STAGE_SECONDS = Histogram('ferelight_stage_seconds', 'Time spent in a stage of a request, summed over its spans.',
+                          ('endpoint', 'mergetype', 'stage'))
+
+
+class RequestRecord:
+    """The stages of one request with their summed durations, and fields to log with it.
+
+    The record is kept in a context variable, which sub-queries on worker threads share with the request, so that
+    their stages are added concurrently.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.fields = {}
+        # stage -> [seconds, spans]
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def mergetype(self):
+        return self.fields.get('mergetype', 'none')
+
+    def add(self, stage, seconds):
+        with self._lock:
+            stage = self.stages.setdefault(stage, [0.0, 0])
+            stage[0] += seconds
+            stage[1] += 1
+
+    def to_dict(self, seconds, status):
+        with self._lock:
+            stages = {name: round(total, 6) for name, (total, _) in self.stages.items()}
+        return dict(endpoint=self.endpoint, status=status, seconds=round(seconds, 6), **self.fields, stages=stages)
+
+
+def add(stage, seconds):
+    """Adds a span of a stage to the record of the current request, if it keeps one."""
+    record = _record.get()
+    if record is not None:
+        record.add(stage, seconds)
+
+
+def annotate(**fields):
+    """Adds fields to the log line of the current request, ``mergetype`` also labels its metrics."""
+    record = _record.get()
+    if record is not None:
+        record.fields.update(fields)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Times the enclosed block as a span of a stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """Times every call of the decorated function as a span of a stage."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def recorded(fn):
+    """Records the stages of each request to the decorated endpoint, adds them to the histograms and logs them."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        record = RequestRecord(fn.__name__)
+        token = _record.set(record)
+        start = time.perf_counter()
+        status = 500
+        try:
+            result = fn(*args, **kwargs)
+            status = _status(result)
+            return result
+        finally:
+            _record.reset(token)
+            finish(record, time.perf_counter() - start, status)
+
+    return wrapper
+
+
+def _status(result):
+    # Like connexion, which answers None with no content
+    if result is None:
+        return 204
+    if isinstance(result, Response):
+        return result.status_code
+    if isinstance(result, tuple) and len(result) > 1 and isinstance(result[1], int):
+        return result[1]
+    return 200
+
+
+def get_log_settings():
+    config = current_app.config if has_app_context() else {}
+    return {key: config.get(key, default) for key, default in LOG_DEFAULTS.items()}
+
+
+def finish(record, seconds, status):
+    """Adds a finished request to the histograms and logs it if it is sampled or slow."""
+    REQUEST_SECONDS.observe(seconds, record.endpoint, record.mergetype)
+    for stage, (total, _) in list(record.stages.items()):
+        STAGE_SECONDS.observe(total, record.endpoint, record.mergetype, stage)
+
+    settings = get_log_settings()
+    if seconds >= settings['LOGSLOWSECONDS'] or random.random() < settings['LOGSAMPLERATE']:
+        data = record.to_dict(seconds, status)
+        logger.info('Request %s', json.dumps(data, separators=(',', ':')), extra={'request': data})
+
+
+def register_cache(name, get):
+    """Reports the statistics of an LRUCache, returned by ``get`` or None if it was not created yet."""
+    _caches[name] = get
+
+
+def _series(name, kind, description, samples, label):
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+    lines.extend(f'{name}{{{_labels((label,), (key,))}}} {_number(value)}' for key, value in sorted(samples.items()))
+    return lines
+
+
+def render():
+    """Returns the request and stage histograms and the statement, cache and pool statistics as Prometheus text."""
+    from ferelight import pool
+    from ferelight import statements
+
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+
+    templates = statements.stats()
+    lines += _series('ferelight_statement_executions_total', 'counter', 'Executions of a statement template.',
+                     {name: x['count'] for name, x in templates.items()}, 'template')
+    lines += _series('ferelight_statement_seconds_total', 'counter', 'Time spent executing a statement template.',
+                     {name: x['seconds'] for name, x in templates.items()}, 'template')
+    lines += _series('ferelight_statement_max_seconds', 'gauge', 'Longest execution of a statement template.',
+                     {name: x['max_seconds'] for name, x in templates.items()}, 'template')
+
+    caches = {name: cache.stats() for name, cache in ((name, get()) for name, get in _caches.items())
+              if cache is not None}
+    for key, kind, description in (('size', 'gauge', 'Entries in a cache.'),
+                                   ('bytes', 'gauge', 'Bytes of the entries in a cache, if it is bounded by bytes.'),
+                                   ('hits', 'counter', 'Lookups of a cache that found an entry.'),
+                                   ('misses', 'counter', 'Lookups of a cache that found no entry.'),
+                                   ('evictions', 'counter', 'Entries evicted from a cache when it was full.'),
+                                   ('expirations', 'counter', 'Entries of a cache that expired.')):
+        name = f'ferelight_cache_{key}' if kind == 'gauge' else f'ferelight_cache_{key}_total'
+        lines += _series(name, kind, description, {cache: x[key] for cache, x in caches.items()}, 'cache')
+
+    pools = pool.stats()
+    lines += _series('ferelight_pool_connections', 'gauge', 'Open connections of a database pool.',
+                     {database: x['size'] for database, x in pools.items()}, 'database')
+    lines += _series('ferelight_pool_idle_connections', 'gauge', 'Idle connections of a database pool.',
+                     {database: x['idle'] for database, x in pools.items()}, 'database')
+    return '\n'.join(lines) + '\n'
+
+
+def response():
+    """Returns the metrics as a response for Prometheus to scrape."""
+    return Response(render(), content_type=CONTENT_TYPE)
@@ -1,11 +1,17 @@
 # flake8: noqa
 # import models into model package
+from ferelight.models.metadata_database_refresh_post200_response import MetadataDatabaseRefreshPost200Response
 from ferelight.models.multimediaobject import Multimediaobject
 from ferelight.models.multimediasegment import Multimediasegment
 from ferelight.models.objectinfos_post_request import ObjectinfosPostRequest
 from ferelight.models.query_post_request import QueryPostRequest
 from ferelight.models.querybyexample_post_request import QuerybyexamplePostRequest
+from ferelight.models.ready_get200_response import ReadyGet200Response
 from ferelight.models.scoredsegment import Scoredsegment
 from ferelight.models.segmentbytime_post200_response import SegmentbytimePost200Response
 from ferelight.models.segmentbytime_post_request import SegmentbytimePostRequest
 from ferelight.models.segmentinfos_post_request import SegmentinfosPostRequest
+from ferelight.models.segmentsbytime_post_request import SegmentsbytimePostRequest
+from ferelight.models.segmentsbytime_post_request_timestamps_inner import SegmentsbytimePostRequestTimestampsInner
+from ferelight.models.textindex_database_refresh_post200_response import TextindexDatabaseRefreshPost200Response
+from ferelight.models.textindex_database_refresh_post_request import TextindexDatabaseRefreshPostRequest
@@ -0,0 +1,91 @@
+from datetime import date, datetime  # noqa: F401
+
+from typing import List, Dict  # noqa: F401
+
+from ferelight.models.base_model import Model
+from ferelight import util
+
+
+class MetadataDatabaseRefreshPost200Response(Model):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+    """
+
+    def __init__(self, objects=None, segments=None):  # noqa: E501
+        """MetadataDatabaseRefreshPost200Response - a model defined in OpenAPI
+
+        :param objects: The objects of this MetadataDatabaseRefreshPost200Response.  # noqa: E501
+        :type objects: int
+        :param segments: The segments of this MetadataDatabaseRefreshPost200Response.  # noqa: E501
+        :type segments: int
+        """
+        self.openapi_types = {
+            'objects': int,
+            'segments': int
+        }
+
+        self.attribute_map = {
+            'objects': 'objects',
+            'segments': 'segments'
+        }
+
+        self._objects = objects
+        self._segments = segments
+
+    @classmethod
+    def from_dict(cls, dikt) -> 'MetadataDatabaseRefreshPost200Response':
+        """Returns the dict as a model
+
+        :param dikt: A dict.
+        :type: dict
+        :return: The _metadata_database_refresh_post_200_response of this MetadataDatabaseRefreshPost200Response.  # noqa: E501
+        :rtype: MetadataDatabaseRefreshPost200Response
+        """
+        return util.deserialize_model(dikt, cls)
+
+    @property
+    def objects(self) -> int:
+        """Gets the objects of this MetadataDatabaseRefreshPost200Response.
+
+        The number of objects loaded.  # noqa: E501
+
+        :return: The objects of this MetadataDatabaseRefreshPost200Response.
+        :rtype: int
+        """
+        return self._objects
+
+    @objects.setter
+    def objects(self, objects: int):
+        """Sets the objects of this MetadataDatabaseRefreshPost200Response.
+
+        The number of objects loaded.  # noqa: E501
+
+        :param objects: The objects of this MetadataDatabaseRefreshPost200Response.
+        :type objects: int
+        """
+
+        self._objects = objects
+
+    @property
+    def segments(self) -> int:
+        """Gets the segments of this MetadataDatabaseRefreshPost200Response.
+
+        The number of segments loaded.  # noqa: E501
+
+        :return: The segments of this MetadataDatabaseRefreshPost200Response.
+        :rtype: int
+        """
+        return self._segments
+
+    @segments.setter
+    def segments(self, segments: int):
+        """Sets the segments of this MetadataDatabaseRefreshPost200Response.
+
+        The number of segments loaded.  # noqa: E501
+
+        :param segments: The segments of this MetadataDatabaseRefreshPost200Response.
+        :type segments: int
+        """
+
+        self._segments = segments
@@ -12,7 +12,7 @@ class QueryPostRequest(Model):
     Do not edit the class manually.
     """
 
-    def __init__(self, database=None, similaritytext=None, ocrtext=None, asrtext=None, mergetype=None, limit=None):  # noqa: E501
+    def __init__(self, database=None, similaritytext=None, ocrtext=None, asrtext=None, mergetype=None, limit=None, weights=None, nprobe=None, offset=0, cursor=None, include=None):  # noqa: E501
         """QueryPostRequest - a model defined in OpenAPI
 
         :param database: The database of this QueryPostRequest.  # noqa: E501
@@ -27,6 +27,16 @@ class QueryPostRequest(Model):
         :type mergetype: str
         :param limit: The limit of this QueryPostRequest.  # noqa: E501
         :type limit: int
+        :param weights: The weights of this QueryPostRequest.  # noqa: E501
+        :type weights: List[float]
+        :param nprobe: The nprobe of this QueryPostRequest.  # noqa: E501
+        :type nprobe: int
+        :param offset: The offset of this QueryPostRequest.  # noqa: E501
+        :type offset: int
+        :param cursor: The cursor of this QueryPostRequest.  # noqa: E501
+        :type cursor: str
+        :param include: The include of this QueryPostRequest.  # noqa: E501
+        :type include: List[str]
         """
         self.openapi_types = {
             'database': str,
@@ -34,7 +44,12 @@ class QueryPostRequest(Model):
             'ocrtext': str,
             'asrtext': str,
             'mergetype': str,
-            'limit': int
+            'limit': int,
+            'weights': List[float],
+            'nprobe': int,
+            'offset': int,
+            'cursor': str,
+            'include': List[str]
         }
 
         self.attribute_map = {
@@ -43,7 +58,12 @@ class QueryPostRequest(Model):
             'ocrtext': 'ocrtext',
             'asrtext': 'asrtext',
             'mergetype': 'mergetype',
-            'limit': 'limit'
+            'limit': 'limit',
+            'weights': 'weights',
+            'nprobe': 'nprobe',
+            'offset': 'offset',
+            'cursor': 'cursor',
+            'include': 'include'
         }
 
         self._database = database
@@ -52,6 +72,11 @@ class QueryPostRequest(Model):
         self._asrtext = asrtext
         self._mergetype = mergetype
         self._limit = limit
+        self._weights = weights
+        self._nprobe = nprobe
+        self._offset = offset
+        self._cursor = cursor
+        self._include = include
 
     @classmethod
     def from_dict(cls, dikt) -> 'QueryPostRequest':
@@ -91,7 +116,7 @@ class QueryPostRequest(Model):
     def similaritytext(self) -> str:
         """Gets the similaritytext of this QueryPostRequest.
 
-        The similarity text.  # noqa: E501
+        The similarity text, up to 8 parts separated by # for merging.  # noqa: E501
 
         :return: The similaritytext of this QueryPostRequest.
         :rtype: str
@@ -102,7 +127,7 @@ class QueryPostRequest(Model):
     def similaritytext(self, similaritytext: str):
         """Sets the similaritytext of this QueryPostRequest.
 
-        The similarity text.  # noqa: E501
+        The similarity text, up to 8 parts separated by # for merging.  # noqa: E501
 
         :param similaritytext: The similaritytext of this QueryPostRequest.
         :type similaritytext: str
@@ -160,7 +185,7 @@ class QueryPostRequest(Model):
     def mergetype(self) -> str:
         """Gets the mergetype of this QueryPostRequest.
 
-        Merge Type for the similaritytext  # noqa: E501
+        Merge Type for the similaritytext. id_intersection (default) and vector_addition merge the similarity text parts, rrf (reciprocal rank fusion) and weighted (weighted score sum) also fuse the OCR and ASR results.  # noqa: E501
 
         :return: The mergetype of this QueryPostRequest.
         :rtype: str
@@ -171,7 +196,7 @@ class QueryPostRequest(Model):
     def mergetype(self, mergetype: str):
         """Sets the mergetype of this QueryPostRequest.
 
-        Merge Type for the similaritytext  # noqa: E501
+        Merge Type for the similaritytext. id_intersection (default) and vector_addition merge the similarity text parts, rrf (reciprocal rank fusion) and weighted (weighted score sum) also fuse the OCR and ASR results.  # noqa: E501
 
         :param mergetype: The mergetype of this QueryPostRequest.
         :type mergetype: str
@@ -199,5 +224,126 @@ class QueryPostRequest(Model):
         :param limit: The limit of this QueryPostRequest.
         :type limit: int
         """
+        if limit is not None and limit < 1:  # noqa: E501
+            raise ValueError("Invalid value for `limit`, must be a value greater than or equal to `1`")  # noqa: E501
 
         self._limit = limit
+
+    @property
+    def weights(self) -> List[float]:
+        """Gets the weights of this QueryPostRequest.
+
+        Weights for rrf and weighted merging, one per similarity text part followed by one each for the OCR and ASR text if given.  # noqa: E501
+
+        :return: The weights of this QueryPostRequest.
+        :rtype: List[float]
+        """
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights: List[float]):
+        """Sets the weights of this QueryPostRequest.
+
+        Weights for rrf and weighted merging, one per similarity text part followed by one each for the OCR and ASR text if given.  # noqa: E501
+
+        :param weights: The weights of this QueryPostRequest.
+        :type weights: List[float]
+        """
+
+        self._weights = weights
+
+    @property
+    def nprobe(self) -> int:
+        """Gets the nprobe of this QueryPostRequest.
+
+        The number of inverted lists searched if the database uses an IVF-PQ vector index, VECTORINDEXNPROBE by default.  # noqa: E501
+
+        :return: The nprobe of this QueryPostRequest.
+        :rtype: int
+        """
+        return self._nprobe
+
+    @nprobe.setter
+    def nprobe(self, nprobe: int):
+        """Sets the nprobe of this QueryPostRequest.
+
+        The number of inverted lists searched if the database uses an IVF-PQ vector index, VECTORINDEXNPROBE by default.  # noqa: E501
+
+        :param nprobe: The nprobe of this QueryPostRequest.
+        :type nprobe: int
+        """
+        if nprobe is not None and nprobe < 1:  # noqa: E501
+            raise ValueError("Invalid value for `nprobe`, must be a value greater than or equal to `1`")  # noqa: E501
+
+        self._nprobe = nprobe
+
+    @property
+    def offset(self) -> int:
+        """Gets the offset of this QueryPostRequest.
+
+        The number of best results to skip, for paging through the results of a query.  # noqa: E501
+
+        :return: The offset of this QueryPostRequest.
+        :rtype: int
+        """
+        return self._offset
+
+    @offset.setter
+    def offset(self, offset: int):
+        """Sets the offset of this QueryPostRequest.
+
+        The number of best results to skip, for paging through the results of a query.  # noqa: E501
+
+        :param offset: The offset of this QueryPostRequest.
+        :type offset: int
+        """
+        if offset is not None and offset < 0:  # noqa: E501
+            raise ValueError("Invalid value for `offset`, must be a value greater than or equal to `0`")  # noqa: E501
+
+        self._offset = offset
+
+    @property
+    def cursor(self) -> str:
+        """Gets the cursor of this QueryPostRequest.
+
+        The X-Next-Cursor header of a previous response, to get its next page. Replaces the other parameters except limit and include.  # noqa: E501
+
+        :return: The cursor of this QueryPostRequest.
+        :rtype: str
+        """
+        return self._cursor
+
+    @cursor.setter
+    def cursor(self, cursor: str):
+        """Sets the cursor of this QueryPostRequest.
+
+        The X-Next-Cursor header of a previous response, to get its next page. Replaces the other parameters except limit and include.  # noqa: E501
+
+        :param cursor: The cursor of this QueryPostRequest.
+        :type cursor: str
+        """
+
+        self._cursor = cursor
+
+    @property
+    def include(self) -> List[str]:
+        """Gets the include of this QueryPostRequest.
+
+        Metadata to return with each segment, segment for its timing and object for the name and path of its object.  # noqa: E501
+
+        :return: The include of this QueryPostRequest.
+        :rtype: List[str]
+        """
+        return self._include
+
+    @include.setter
+    def include(self, include: List[str]):
+        """Sets the include of this QueryPostRequest.
+
+        Metadata to return with each segment, segment for its timing and object for the name and path of its object.  # noqa: E501
+
+        :param include: The include of this QueryPostRequest.
+        :type include: List[str]
+        """
+
+        self._include = include
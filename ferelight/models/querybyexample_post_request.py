@@ -12,7 +12,7 @@ class QuerybyexamplePostRequest(Model):
     Do not edit the class manually.
     """
 
-    def __init__(self, database=None, segmentid=None, limit=10):  # noqa: E501
+    def __init__(self, database=None, segmentid=None, limit=10, nprobe=None, segmentids=None, mergetype=None, exclude=None, include=None):  # noqa: E501
         """QuerybyexamplePostRequest - a model defined in OpenAPI
 
         :param database: The database of this QuerybyexamplePostRequest.  # noqa: E501
@@ -21,22 +21,47 @@ class QuerybyexamplePostRequest(Model):
         :type segmentid: str
         :param limit: The limit of this QuerybyexamplePostRequest.  # noqa: E501
         :type limit: int
+        :param nprobe: The nprobe of this QuerybyexamplePostRequest.  # noqa: E501
+        :type nprobe: int
+        :param segmentids: The segmentids of this QuerybyexamplePostRequest.  # noqa: E501
+        :type segmentids: List[str]
+        :param mergetype: The mergetype of this QuerybyexamplePostRequest.  # noqa: E501
+        :type mergetype: str
+        :param exclude: The exclude of this QuerybyexamplePostRequest.  # noqa: E501
+        :type exclude: List[str]
+        :param include: The include of this QuerybyexamplePostRequest.  # noqa: E501
+        :type include: List[str]
         """
         self.openapi_types = {
             'database': str,
             'segmentid': str,
-            'limit': int
+            'limit': int,
+            'nprobe': int,
+            'segmentids': List[str],
+            'mergetype': str,
+            'exclude': List[str],
+            'include': List[str]
         }
 
         self.attribute_map = {
             'database': 'database',
             'segmentid': 'segmentid',
-            'limit': 'limit'
+            'limit': 'limit',
+            'nprobe': 'nprobe',
+            'segmentids': 'segmentids',
+            'mergetype': 'mergetype',
+            'exclude': 'exclude',
+            'include': 'include'
         }
 
         self._database = database
         self._segmentid = segmentid
         self._limit = limit
+        self._nprobe = nprobe
+        self._segmentids = segmentids
+        self._mergetype = mergetype
+        self._exclude = exclude
+        self._include = include
 
     @classmethod
     def from_dict(cls, dikt) -> 'QuerybyexamplePostRequest':
@@ -115,5 +140,124 @@ class QuerybyexamplePostRequest(Model):
         :param limit: The limit of this QuerybyexamplePostRequest.
         :type limit: int
         """
+        if limit is not None and limit < 1:  # noqa: E501
+            raise ValueError("Invalid value for `limit`, must be a value greater than or equal to `1`")  # noqa: E501
 
         self._limit = limit
+
+    @property
+    def nprobe(self) -> int:
+        """Gets the nprobe of this QuerybyexamplePostRequest.
+
+        The number of inverted lists searched if the database uses an IVF-PQ vector index, VECTORINDEXNPROBE by default.  # noqa: E501
+
+        :return: The nprobe of this QuerybyexamplePostRequest.
+        :rtype: int
+        """
+        return self._nprobe
+
+    @nprobe.setter
+    def nprobe(self, nprobe: int):
+        """Sets the nprobe of this QuerybyexamplePostRequest.
+
+        The number of inverted lists searched if the database uses an IVF-PQ vector index, VECTORINDEXNPROBE by default.  # noqa: E501
+
+        :param nprobe: The nprobe of this QuerybyexamplePostRequest.
+        :type nprobe: int
+        """
+        if nprobe is not None and nprobe < 1:  # noqa: E501
+            raise ValueError("Invalid value for `nprobe`, must be a value greater than or equal to `1`")  # noqa: E501
+
+        self._nprobe = nprobe
+
+    @property
+    def segmentids(self) -> List[str]:
+        """Gets the segmentids of this QuerybyexamplePostRequest.
+
+        Further segment IDs to find neighbors for, together with segmentid if given.  # noqa: E501
+
+        :return: The segmentids of this QuerybyexamplePostRequest.
+        :rtype: List[str]
+        """
+        return self._segmentids
+
+    @segmentids.setter
+    def segmentids(self, segmentids: List[str]):
+        """Sets the segmentids of this QuerybyexamplePostRequest.
+
+        Further segment IDs to find neighbors for, together with segmentid if given.  # noqa: E501
+
+        :param segmentids: The segmentids of this QuerybyexamplePostRequest.
+        :type segmentids: List[str]
+        """
+
+        self._segmentids = segmentids
+
+    @property
+    def mergetype(self) -> str:
+        """Gets the mergetype of this QuerybyexamplePostRequest.
+
+        How several segments are combined. centroid (default) searches with their mean feature, rrf fuses their neighbors by reciprocal rank fusion.  # noqa: E501
+
+        :return: The mergetype of this QuerybyexamplePostRequest.
+        :rtype: str
+        """
+        return self._mergetype
+
+    @mergetype.setter
+    def mergetype(self, mergetype: str):
+        """Sets the mergetype of this QuerybyexamplePostRequest.
+
+        How several segments are combined. centroid (default) searches with their mean feature, rrf fuses their neighbors by reciprocal rank fusion.  # noqa: E501
+
+        :param mergetype: The mergetype of this QuerybyexamplePostRequest.
+        :type mergetype: str
+        """
+
+        self._mergetype = mergetype
+
+    @property
+    def exclude(self) -> List[str]:
+        """Gets the exclude of this QuerybyexamplePostRequest.
+
+        Segment IDs to leave out of the result, e.g. ones that were already seen. The given segments are always left out.  # noqa: E501
+
+        :return: The exclude of this QuerybyexamplePostRequest.
+        :rtype: List[str]
+        """
+        return self._exclude
+
+    @exclude.setter
+    def exclude(self, exclude: List[str]):
+        """Sets the exclude of this QuerybyexamplePostRequest.
+
+        Segment IDs to leave out of the result, e.g. ones that were already seen. The given segments are always left out.  # noqa: E501
+
+        :param exclude: The exclude of this QuerybyexamplePostRequest.
+        :type exclude: List[str]
+        """
+
+        self._exclude = exclude
+
+    @property
+    def include(self) -> List[str]:
+        """Gets the include of this QuerybyexamplePostRequest.
+
+        Metadata to return with each segment, segment for its timing and object for the name and path of its object.  # noqa: E501
+
+        :return: The include of this QuerybyexamplePostRequest.
+        :rtype: List[str]
+        """
+        return self._include
+
+    @include.setter
+    def include(self, include: List[str]):
+        """Sets the include of this QuerybyexamplePostRequest.
+
+        Metadata to return with each segment, segment for its timing and object for the name and path of its object.  # noqa: E501
+
+        :param include: The include of this QuerybyexamplePostRequest.
+        :type include: List[str]
+        """
+
+        self._include = include
@@ -0,0 +1,91 @@
+from datetime import date, datetime  # noqa: F401
+
+from typing import List, Dict  # noqa: F401
+
+from ferelight.models.base_model import Model
+from ferelight import util
+
+
+class ReadyGet200Response(Model):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+    """
+
+    def __init__(self, ready=None, model=None):  # noqa: E501
+        """ReadyGet200Response - a model defined in OpenAPI
+
+        :param ready: The ready of this ReadyGet200Response.  # noqa: E501
+        :type ready: bool
+        :param model: The model of this ReadyGet200Response.  # noqa: E501
+        :type model: str
+        """
+        self.openapi_types = {
+            'ready': bool,
+            'model': str
+        }
+
+        self.attribute_map = {
+            'ready': 'ready',
+            'model': 'model'
+        }
+
+        self._ready = ready
+        self._model = model
+
+    @classmethod
+    def from_dict(cls, dikt) -> 'ReadyGet200Response':
+        """Returns the dict as a model
+
+        :param dikt: A dict.
+        :type: dict
+        :return: The _ready_get_200_response of this ReadyGet200Response.  # noqa: E501
+        :rtype: ReadyGet200Response
+        """
+        return util.deserialize_model(dikt, cls)
+
+    @property
+    def ready(self) -> bool:
+        """Gets the ready of this ReadyGet200Response.
+
+        Whether the text encoder is loaded.  # noqa: E501
+
+        :return: The ready of this ReadyGet200Response.
+        :rtype: bool
+        """
+        return self._ready
+
+    @ready.setter
+    def ready(self, ready: bool):
+        """Sets the ready of this ReadyGet200Response.
+
+        Whether the text encoder is loaded.  # noqa: E501
+
+        :param ready: The ready of this ReadyGet200Response.
+        :type ready: bool
+        """
+
+        self._ready = ready
+
+    @property
+    def model(self) -> str:
+        """Gets the model of this ReadyGet200Response.
+
+        The name of the text encoder model.  # noqa: E501
+
+        :return: The model of this ReadyGet200Response.
+        :rtype: str
+        """
+        return self._model
+
+    @model.setter
+    def model(self, model: str):
+        """Sets the model of this ReadyGet200Response.
+
+        The name of the text encoder model.  # noqa: E501
+
+        :param model: The model of this ReadyGet200Response.
+        :type model: str
+        """
+
+        self._model = model
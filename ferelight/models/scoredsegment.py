@@ -3,6 +3,8 @@ from datetime import date, datetime  # noqa: F401
 from typing import List, Dict  # noqa: F401
 
 from ferelight.models.base_model import Model
+from ferelight.models.multimediaobject import Multimediaobject
+from ferelight.models.multimediasegment import Multimediasegment
 from ferelight import util
 
 
@@ -12,26 +14,36 @@ class Scoredsegment(Model):
     Do not edit the class manually.
     """
 
-    def __init__(self, segmentid=None, score=None):  # noqa: E501
+    def __init__(self, segmentid=None, score=None, segment=None, object=None):  # noqa: E501
         """Scoredsegment - a model defined in OpenAPI
 
         :param segmentid: The segmentid of this Scoredsegment.  # noqa: E501
         :type segmentid: str
         :param score: The score of this Scoredsegment.  # noqa: E501
         :type score: float
+        :param segment: The segment of this Scoredsegment.  # noqa: E501
+        :type segment: Multimediasegment
+        :param object: The object of this Scoredsegment.  # noqa: E501
+        :type object: Multimediaobject
         """
         self.openapi_types = {
             'segmentid': str,
-            'score': float
+            'score': float,
+            'segment': Multimediasegment,
+            'object': Multimediaobject
         }
 
         self.attribute_map = {
             'segmentid': 'segmentid',
-            'score': 'score'
+            'score': 'score',
+            'segment': 'segment',
+            'object': 'object'
         }
 
         self._segmentid = segmentid
         self._score = score
+        self._segment = segment
+        self._object = object
 
     @classmethod
     def from_dict(cls, dikt) -> 'Scoredsegment':
@@ -89,3 +101,49 @@ class Scoredsegment(Model):
         """
 
         self._score = score
+
+    @property
+    def segment(self) -> Multimediasegment:
+        """Gets the segment of this Scoredsegment.
+
+          # noqa: E501
+
+        :return: The segment of this Scoredsegment.
+        :rtype: Multimediasegment
+        """
+        return self._segment
+
+    @segment.setter
+    def segment(self, segment: Multimediasegment):
+        """Sets the segment of this Scoredsegment.
+
+          # noqa: E501
+
+        :param segment: The segment of this Scoredsegment.
+        :type segment: Multimediasegment
+        """
+
+        self._segment = segment
+
+    @property
+    def object(self) -> Multimediaobject:
+        """Gets the object of this Scoredsegment.
+
+          # noqa: E501
+
+        :return: The object of this Scoredsegment.
+        :rtype: Multimediaobject
+        """
+        return self._object
+
+    @object.setter
+    def object(self, object: Multimediaobject):
+        """Sets the object of this Scoredsegment.
+
+          # noqa: E501
+
+        :param object: The object of this Scoredsegment.
+        :type object: Multimediaobject
+        """
+
+        self._object = object
@@ -0,0 +1,92 @@
+from datetime import date, datetime  # noqa: F401
+
+from typing import List, Dict  # noqa: F401
+
+from ferelight.models.base_model import Model
+from ferelight.models.segmentsbytime_post_request_timestamps_inner import SegmentsbytimePostRequestTimestampsInner
+from ferelight import util
+
+
+class SegmentsbytimePostRequest(Model):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+    """
+
+    def __init__(self, database=None, timestamps=None):  # noqa: E501
+        """SegmentsbytimePostRequest - a model defined in OpenAPI
+
+        :param database: The database of this SegmentsbytimePostRequest.  # noqa: E501
+        :type database: str
+        :param timestamps: The timestamps of this SegmentsbytimePostRequest.  # noqa: E501
+        :type timestamps: List[SegmentsbytimePostRequestTimestampsInner]
+        """
+        self.openapi_types = {
+            'database': str,
+            'timestamps': List[SegmentsbytimePostRequestTimestampsInner]
+        }
+
+        self.attribute_map = {
+            'database': 'database',
+            'timestamps': 'timestamps'
+        }
+
+        self._database = database
+        self._timestamps = timestamps
+
+    @classmethod
+    def from_dict(cls, dikt) -> 'SegmentsbytimePostRequest':
+        """Returns the dict as a model
+
+        :param dikt: A dict.
+        :type: dict
+        :return: The _segmentsbytime_post_request of this SegmentsbytimePostRequest.  # noqa: E501
+        :rtype: SegmentsbytimePostRequest
+        """
+        return util.deserialize_model(dikt, cls)
+
+    @property
+    def database(self) -> str:
+        """Gets the database of this SegmentsbytimePostRequest.
+
+        The name of the database to query.  # noqa: E501
+
+        :return: The database of this SegmentsbytimePostRequest.
+        :rtype: str
+        """
+        return self._database
+
+    @database.setter
+    def database(self, database: str):
+        """Sets the database of this SegmentsbytimePostRequest.
+
+        The name of the database to query.  # noqa: E501
+
+        :param database: The database of this SegmentsbytimePostRequest.
+        :type database: str
+        """
+
+        self._database = database
+
+    @property
+    def timestamps(self) -> List[SegmentsbytimePostRequestTimestampsInner]:
+        """Gets the timestamps of this SegmentsbytimePostRequest.
+
+        The timestamps to find the segments at, each with the object ID to find the segment in.  # noqa: E501
+
+        :return: The timestamps of this SegmentsbytimePostRequest.
+        :rtype: List[SegmentsbytimePostRequestTimestampsInner]
+        """
+        return self._timestamps
+
+    @timestamps.setter
+    def timestamps(self, timestamps: List[SegmentsbytimePostRequestTimestampsInner]):
+        """Sets the timestamps of this SegmentsbytimePostRequest.
+
+        The timestamps to find the segments at, each with the object ID to find the segment in.  # noqa: E501
+
+        :param timestamps: The timestamps of this SegmentsbytimePostRequest.
+        :type timestamps: List[SegmentsbytimePostRequestTimestampsInner]
+        """
+
+        self._timestamps = timestamps
@@ -0,0 +1,91 @@
+from datetime import date, datetime  # noqa: F401
+
+from typing import List, Dict  # noqa: F401
+
+from ferelight.models.base_model import Model
+from ferelight import util
+
+
+class TextindexDatabaseRefreshPost200Response(Model):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+    """
+
+    def __init__(self, ocr=None, asr=None):  # noqa: E501
+        """TextindexDatabaseRefreshPost200Response - a model defined in OpenAPI
+
+        :param ocr: The ocr of this TextindexDatabaseRefreshPost200Response.  # noqa: E501
+        :type ocr: int
+        :param asr: The asr of this TextindexDatabaseRefreshPost200Response.  # noqa: E501
+        :type asr: int
+        """
+        self.openapi_types = {
+            'ocr': int,
+            'asr': int
+        }
+
+        self.attribute_map = {
+            'ocr': 'ocr',
+            'asr': 'asr'
+        }
+
+        self._ocr = ocr
+        self._asr = asr
+
+    @classmethod
+    def from_dict(cls, dikt) -> 'TextindexDatabaseRefreshPost200Response':
+        """Returns the dict as a model
+
+        :param dikt: A dict.
+        :type: dict
+        :return: The _textindex_database_refresh_post_200_response of this TextindexDatabaseRefreshPost200Response.  # noqa: E501
+        :rtype: TextindexDatabaseRefreshPost200Response
+        """
+        return util.deserialize_model(dikt, cls)
+
+    @property
+    def ocr(self) -> int:
+        """Gets the ocr of this TextindexDatabaseRefreshPost200Response.
+
+        The number of segments with OCR text in the index.  # noqa: E501
+
+        :return: The ocr of this TextindexDatabaseRefreshPost200Response.
+        :rtype: int
+        """
+        return self._ocr
+
+    @ocr.setter
+    def ocr(self, ocr: int):
+        """Sets the ocr of this TextindexDatabaseRefreshPost200Response.
+
+        The number of segments with OCR text in the index.  # noqa: E501
+
+        :param ocr: The ocr of this TextindexDatabaseRefreshPost200Response.
+        :type ocr: int
+        """
+
+        self._ocr = ocr
+
+    @property
+    def asr(self) -> int:
+        """Gets the asr of this TextindexDatabaseRefreshPost200Response.
+
+        The number of segments with ASR text in the index.  # noqa: E501
+
+        :return: The asr of this TextindexDatabaseRefreshPost200Response.
+        :rtype: int
+        """
+        return self._asr
+
+    @asr.setter
+    def asr(self, asr: int):
+        """Sets the asr of this TextindexDatabaseRefreshPost200Response.
+
+        The number of segments with ASR text in the index.  # noqa: E501
+
+        :param asr: The asr of this TextindexDatabaseRefreshPost200Response.
+        :type asr: int
+        """
+
+        self._asr = asr
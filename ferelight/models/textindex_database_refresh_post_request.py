@@ -0,0 +1,63 @@
+from datetime import date, datetime  # noqa: F401
+
+from typing import List, Dict  # noqa: F401
+
+from ferelight.models.base_model import Model
+from ferelight import util
+
+
+class TextindexDatabaseRefreshPostRequest(Model):
+    """NOTE: This class is auto generated by OpenAPI Generator (https://openapi-generator.tech).
+
+    Do not edit the class manually.
+    """
+
+    def __init__(self, segmentids=None):  # noqa: E501
+        """TextindexDatabaseRefreshPostRequest - a model defined in OpenAPI
+
+        :param segmentids: The segmentids of this TextindexDatabaseRefreshPostRequest.  # noqa: E501
+        :type segmentids: List[str]
+        """
+        self.openapi_types = {
+            'segmentids': List[str]
+        }
+
+        self.attribute_map = {
+            'segmentids': 'segmentids'
+        }
+
+        self._segmentids = segmentids
+
+    @classmethod
+    def from_dict(cls, dikt) -> 'TextindexDatabaseRefreshPostRequest':
+        """Returns the dict as a model
+
+        :param dikt: A dict.
+        :type: dict
+        :return: The _textindex_database_refresh_post_request of this TextindexDatabaseRefreshPostRequest.  # noqa: E501
+        :rtype: TextindexDatabaseRefreshPostRequest
+        """
+        return util.deserialize_model(dikt, cls)
+
+    @property
+    def segmentids(self) -> List[str]:
+        """Gets the segmentids of this TextindexDatabaseRefreshPostRequest.
+
+        The IDs of the segments whose rows were added, changed or deleted. If it is missing, the tables are indexed again completely.  # noqa: E501
+
+        :return: The segmentids of this TextindexDatabaseRefreshPostRequest.
+        :rtype: List[str]
+        """
+        return self._segmentids
+
+    @segmentids.setter
+    def segmentids(self, segmentids: List[str]):
+        """Sets the segmentids of this TextindexDatabaseRefreshPostRequest.
+
+        The IDs of the segments whose rows were added, changed or deleted. If it is missing, the tables are indexed again completely.  # noqa: E501
+
+        :param segmentids: The segmentids of this TextindexDatabaseRefreshPostRequest.
+        :type segmentids: List[str]
+        """
+
+        self._segmentids = segmentids
@@ -0,0 +1,58 @@
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+from ferelight import pool
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Returns the thread pool that runs sub-queries, sized like the connection pool of a database."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = pool.get_settings()['DBPOOLMAX']
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ferelight-query')
+    return _executor
+
+
+def submit(database, task, *args):
+    """Runs ``task(cur, *args)`` on a separate pooled connection and returns a future for its result.
+
+    The caller should not hold a connection of the same database while waiting for the future, otherwise a full pool
+    can make the task wait for a connection that is never returned.
+    """
+    # Creates the pool on the calling thread, which has the application context to read the configuration from
+    pool.get_pool(database)
+    return get_executor().submit(_in_app_context(_run), database, task, *args)
+
+
+def submit_compute(task, *args):
+    """Runs ``task(*args)`` on the thread pool without a database connection and returns a future for its result."""
+    return get_executor().submit(_in_app_context(task), *args)
+
+
+def _run(database, task, *args):
+    with pool.get_connection(database) as conn:
+        return task(conn.cursor(), *args)
+
+
+def _in_app_context(fn):
+    # Worker threads do not inherit the application context or the context variables of the request that submitted
+    # the task, e.g. the record of its search parameters
+    context = contextvars.copy_context()
+    if not has_app_context():
+        return functools.partial(context.run, fn)
+    app = current_app._get_current_object()
+
+    def run(*args):
+        with app.app_context():
+            return fn(*args)
+
+    return functools.partial(context.run, run)
@@ -0,0 +1,59 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from ferelight import parallel
+
+
+class QueryPlan:
+    """A dependency graph of the sub-queries of one request.
+
+    Every step runs exactly once, as soon as the steps it depends on are done. Independent steps run concurrently,
+    steps that query the database each on their own pooled connection. The results of the dependencies are passed to
+    a step after its own arguments, in the order the dependencies were given.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self._steps = {}
+
+    def query(self, name, fn, *args, after=()):
+        """Adds a step that runs ``fn(cur, *args, *dependency_results)`` on a pooled connection."""
+        self._add(name, fn, args, after, True)
+        return self
+
+    def compute(self, name, fn, *args, after=()):
+        """Adds a step that runs ``fn(*args, *dependency_results)`` without a database connection."""
+        self._add(name, fn, args, after, False)
+        return self
+
+    def run(self):
+        """Runs all steps and returns their results by name."""
+        results = {}
+        running = {}
+        pending = dict(self._steps)
+        try:
+            while pending or running:
+                for name, (fn, args, after, uses_connection) in list(pending.items()):
+                    if all(dependency in results for dependency in after):
+                        arguments = args + tuple(results[dependency] for dependency in after)
+                        if uses_connection:
+                            future = parallel.submit(self.database, fn, *arguments)
+                        else:
+                            future = parallel.submit_compute(fn, *arguments)
+                        running[future] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        finally:
+            for future in running:
+                future.cancel()
+        return results
+
+    def _add(self, name, fn, args, after, uses_connection):
+        if name in self._steps:
+            raise ValueError(f'Step {name} is already part of the plan')
+        for dependency in after:
+            if dependency not in self._steps:
+                raise ValueError(f'Step {name} depends on unknown step {dependency}')
+        self._steps[name] = (fn, args, tuple(after), uses_connection)
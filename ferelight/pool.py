@@ -0,0 +1,241 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from flask import current_app
+from psycopg2.pool import PoolError
+
+from ferelight import bootstrap
+from ferelight import metrics
+
+# Pool settings read from config.json next to the DB* connection keys, with their defaults.
+# DBPOOLIDLE and DBPOOLCHECK are in seconds, DBPOOLTIMEOUT is how long a request waits for a free connection.
+POOL_DEFAULTS = {
+    'DBPOOLMIN': 1,
+    'DBPOOLMAX': 10,
+    'DBPOOLIDLE': 300,
+    'DBPOOLCHECK': 30,
+    'DBPOOLTIMEOUT': 30,
+}
+
+_settings = None
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """A psycopg2 connection that remembers when it was last used and last checked, and what it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+        self.prepared = set()
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of connections to a single database.
+
+    Idle connections above the minimum size are closed after ``idle_timeout`` seconds, and connections that have
+    been idle for longer than ``check_interval`` seconds are pinged before they are handed out again.
+    """
+
+    def __init__(self, database, connect_kwargs, minsize=1, maxsize=10, idle_timeout=300, check_interval=30,
+                 timeout=30, on_connect=None):
+        if minsize < 0 or maxsize < 1 or minsize > maxsize:
+            raise ValueError(f'Invalid pool size for database {database}: min {minsize}, max {maxsize}')
+        self.database = database
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self._connect_kwargs = connect_kwargs
+        self._on_connect = on_connect
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError(f'Connection pool for database {self.database} is closed')
+                    self._evict_idle()
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.maxsize:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolError(f'No free connection for database {self.database} after {self.timeout}s')
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for the duration of one transaction.
+
+        The transaction is committed on success and rolled back on error, and the connection is returned to the pool
+        afterwards. Connections that broke while in use are dropped instead.
+        """
+        with metrics.span('connect'):
+            conn = self.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self._connect_kwargs)
+        try:
+            if self._on_connect is not None:
+                self._on_connect(conn)
+                conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - conn.last_checked < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        conn.last_checked = now
+        return True
+
+    def _evict_idle(self):
+        # Oldest connections sit at the left end, the most recently returned ones are reused first.
+        now = time.monotonic()
+        while self._idle and self._size > self.minsize and now - self._idle[0].last_used > self.idle_timeout:
+            conn = self._idle.popleft()
+            self._size -= 1
+            conn.close()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+def configure(config):
+    """Captures the connection and pool settings so that pools can also be created outside of a request context."""
+    global _settings
+    # Missing connection keys fall back to the libpq defaults
+    settings = {key: config.get(key) for key in ('DBHOST', 'DBPORT', 'DBUSER', 'DBPASSWORD')}
+    for key, default in POOL_DEFAULTS.items():
+        settings[key] = type(default)(config.get(key, default))
+    _settings = settings
+
+
+def get_settings():
+    if _settings is None:
+        configure(current_app.config)
+    return _settings
+
+
+def get_pool(database):
+    pool = _pools.get(database)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            get_settings()
+            pool = ConnectionPool(
+                database,
+                dict(dbname=database, user=_settings['DBUSER'], password=_settings['DBPASSWORD'],
+                     host=_settings['DBHOST'], port=_settings['DBPORT']),
+                minsize=_settings['DBPOOLMIN'], maxsize=_settings['DBPOOLMAX'],
+                idle_timeout=_settings['DBPOOLIDLE'], check_interval=_settings['DBPOOLCHECK'],
+                timeout=_settings['DBPOOLTIMEOUT'], on_connect=bootstrap.prepare_connection)
+            _pools[database] = pool
+    return pool
+
+
+def get_connection(database):
+    return get_pool(database).connection()
+
+
+def stats():
+    """Returns the open and idle connections of the pool of every database."""
+    return {database: {'size': pool.size, 'idle': pool.idle} for database, pool in list(_pools.items())}
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.closeall()
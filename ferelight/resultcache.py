@@ -0,0 +1,148 @@
+import base64
+import binascii
+import json
+import threading
+
+from flask import current_app, has_app_context
+
+from ferelight import metrics
+from ferelight.cache import LRUCache
+
+RESULTCACHE_DEFAULTS = {
+    'RESULTCACHESIZE': 256,
+    'RESULTCACHETTL': 300,
+    'RESULTCACHEDEPTH': 500,
+    'RESULTCACHESHALLOW': False,
+}
+
+# The types of the fields of a normalized /query request, see default_controller.normalize_query
+REQUEST_FIELDS = {
+    'database': str,
+    'similaritytext': str,
+    'ocrtext': str,
+    'asrtext': str,
+    'mergetype': str,
+    'weights': list,
+    'nprobe': int,
+}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class CachedResult:
+    """The ranked result of one search, best first, and the limit it was searched with."""
+
+    def __init__(self, ranked, depth):
+        self.ranked = ranked
+        self.depth = depth
+
+    @property
+    def complete(self):
+        """Whether the search returned all results, because it had no limit or found fewer results than it."""
+        return self.depth is None or len(self.ranked) < self.depth
+
+    def covers(self, end):
+        """Whether the ranking holds all results up to position ``end``, which is None for all results."""
+        return self.complete or (end is not None and end <= self.depth)
+
+    def has_more(self, end):
+        """Whether the ranking holds results after position ``end``, for a cursor to the next page."""
+        return end is not None and end < len(self.ranked)
+
+
+metrics.register_cache('results', lambda: _cache)
+
+
+def get_settings():
+    config = current_app.config if has_app_context() else {}
+    return {key: config.get(key, default) for key, default in RESULTCACHE_DEFAULTS.items()}
+
+
+def get_cache():
+    """Returns the result cache, sized by RESULTCACHESIZE entries and expiring them after RESULTCACHETTL seconds."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = get_settings()
+                _cache = LRUCache(maxsize=settings['RESULTCACHESIZE'], ttl=settings['RESULTCACHETTL'])
+    return _cache
+
+
+def get_depth(end, first_page=False):
+    """Returns the limit to search with to serve results up to position ``end`` and the pages after it.
+
+    Queries are searched once for at least RESULTCACHEDEPTH results, whose pages are then served from the cache. With
+    RESULTCACHESHALLOW, first pages are only searched up to their end, so that queries that are not paged cost as much
+    as without the cache, and they get no cursor to a next page.
+    """
+    if end is None:
+        return None
+    settings = get_settings()
+    if first_page and settings['RESULTCACHESHALLOW']:
+        return end
+    return max(end, settings['RESULTCACHEDEPTH'])
+
+
+def key(request):
+    """Returns the cache key of a normalized request, its database first."""
+    return (request['database'],) + tuple(sorted((name, json.dumps(value)) for name, value in request.items()
+                                                 if name != 'database'))
+
+
+def get(request):
+    return get_cache().get(key(request))
+
+
+def put(request, ranked, depth):
+    result = CachedResult(ranked, depth)
+    get_cache().put(key(request), result)
+    return result
+
+
+def invalidate(database=None):
+    """Drops the cached results of one or all databases, e.g. after their features changed."""
+    if database is None:
+        get_cache().clear()
+    else:
+        get_cache().remove_if(lambda cache_key: cache_key[0] == database)
+
+
+def encode_cursor(request, offset, limit, depth):
+    """Returns an opaque cursor for the page of ``limit`` results of a normalized request that starts at ``offset``.
+
+    The cursor also holds the depth of the ranking the page is cut from, so that all pages of a cursor come from the
+    same ranking, searched again with the same depth if it left the cache.
+    """
+    data = json.dumps({'request': request, 'offset': offset, 'limit': limit, 'depth': depth}, separators=(',', ':'),
+                      sort_keys=True)
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns the normalized request, offset, limit and depth of a cursor, or raises ValueError if it is not valid."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        request, offset, limit, depth = data['request'], data['offset'], data['limit'], data['depth']
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if (not _is_request(request) or not _is_int(offset) or offset < 0 or not _is_int(limit) or limit < 1
+            or not (depth is None or _is_int(depth) and depth >= 1)):
+        raise ValueError('Invalid cursor')
+    return request, offset, limit, depth
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_request(request):
+    """Whether a request decoded from a cursor has the fields of a normalized /query request, with their types."""
+    if not isinstance(request, dict) or 'database' not in request:
+        return False
+    for name, value in request.items():
+        kind = REQUEST_FIELDS.get(name)
+        if kind is None or not isinstance(value, kind) or isinstance(value, bool):
+            return False
+    return all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in request.get('weights', []))
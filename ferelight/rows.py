@@ -0,0 +1,86 @@
+import json
+from typing import NamedTuple
+
+from flask import Response
+
+from ferelight import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Tuple counterparts of the generated models for list responses. The models keep two dicts per instance and are
+# serialized attribute by attribute by encoder.JSONEncoder, these are built straight from cursor rows, in the column
+# order of their statements, and serialized as a whole by response.
+
+class ScoredRow(NamedTuple):
+    """A Scoredsegment."""
+    segmentid: str
+    score: float
+
+
+class SegmentRow(NamedTuple):
+    """A Multimediasegment."""
+    segmentid: str
+    objectid: str
+    segmentnumber: int
+    segmentstart: int
+    segmentend: int
+    segmentstartabs: float
+    segmentendabs: float
+
+
+class ObjectRow(NamedTuple):
+    """A Multimediaobject."""
+    objectid: str
+    mediatype: int
+    name: str
+    path: str
+
+
+class DetailedRow(NamedTuple):
+    """A Scoredsegment with its segment and object, each None unless it was included."""
+    segmentid: str
+    score: float
+    segment: SegmentRow
+    object: ObjectRow
+
+
+def to_dict(row):
+    """Returns the JSON object of a row and the rows nested in it, without null values like encoder.JSONEncoder."""
+    return {field: to_dict(value) if isinstance(value, tuple) else value
+            for field, value in zip(row._fields, row) if value is not None}
+
+
+def to_dicts(rows):
+    """Returns the JSON objects of rows of one type."""
+    if not rows:
+        return []
+    if isinstance(rows[0], ScoredRow):
+        return [{'segmentid': segmentid, 'score': score} for segmentid, score in rows]
+    if isinstance(rows[0], DetailedRow):
+        return list(map(to_dict, rows))
+    fields = rows[0]._fields
+    return [{field: value for field, value in zip(fields, row) if value is not None} for row in rows]
+
+
+def dumps(obj):
+    """Serializes dicts, lists and scalars to JSON bytes, with orjson if it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def response(rows, status=200, headers=None):
+    """Returns a JSON response with the list of rows."""
+    with metrics.span('serialize'):
+        data = dumps(to_dicts(rows))
+    return Response(data, status=status, headers=headers, mimetype='application/json')
+
+
+def json_response(obj, status=200, headers=None):
+    with metrics.span('serialize'):
+        data = dumps(obj)
+    return Response(data, status=status, headers=headers, mimetype='application/json')
@@ -0,0 +1,150 @@
+import contextvars
+import functools
+import logging
+import math
+
+from flask import current_app, has_app_context
+
+from ferelight import bootstrap
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEFAULTS = {
+    'SEARCHRECALL': 0.95,
+    'SEARCHEFMIN': 40,
+    'SEARCHEFMAX': 1000,
+    'SEARCHATTEMPTS': 3,
+}
+# ef_search grows by this factor on every retry of a filtered search that came back short
+EF_GROWTH = 4
+# Assumed fraction of rows passing a filter whose size is unknown, like a full-text match
+UNKNOWN_SELECTIVITY = 0.1
+
+_recorded = contextvars.ContextVar('ferelight_search_parameters', default=None)
+
+
+class SearchParameters:
+    """The HNSW parameters chosen for one index search, and how the search went."""
+
+    def __init__(self, name, limit, selectivity, ef_search, iterative_scan):
+        self.name = name
+        self.limit = limit
+        self.selectivity = selectivity
+        self.ef_search = ef_search
+        self.iterative_scan = iterative_scan
+        self.attempts = 0
+        self.results = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'limit': self.limit,
+            'selectivity': self.selectivity,
+            'ef_search': self.ef_search,
+            'iterative_scan': self.iterative_scan,
+            'attempts': self.attempts,
+            'results': self.results,
+        }
+
+
+def get_settings():
+    config = current_app.config if has_app_context() else {}
+    return {key: config.get(key, default) for key, default in SEARCH_DEFAULTS.items()}
+
+
+def choose(name, limit, selectivity=1.0, iterative_scan=False, settings=None):
+    """Chooses ef_search for an HNSW search of ``limit`` rows of which a fraction ``selectivity`` passes the filter.
+
+    The index has to find about ``limit / selectivity`` neighbours for ``limit`` of them to pass the filter, and a
+    candidate list of ``-log10(1 - recall)`` times that size to find them with the target recall, e.g. 1.3 times for
+    0.95. If the database supports iterative scans, the scan continues past ef_search until enough rows passed, so
+    ef_search only has to reach the target recall for the rows that are returned.
+
+    :rtype: SearchParameters
+    """
+    settings = settings or get_settings()
+    needed = needed_ef(limit if iterative_scan else limit / max(selectivity, 1e-6), settings)
+    ef_search = int(min(max(needed, settings['SEARCHEFMIN']), settings['SEARCHEFMAX']))
+    return SearchParameters(name, limit, selectivity, ef_search, iterative_scan)
+
+
+def needed_ef(neighbours, settings):
+    """Returns the ef_search that finds ``neighbours`` rows with the target recall, see choose."""
+    recall = min(settings['SEARCHRECALL'], 0.999)
+    return math.ceil(neighbours * max(1.0, -math.log10(1 - recall)))
+
+
+def search(cur, name, run, limit, filtered=False, candidates=None):
+    """Runs ``run(cur)`` with search parameters chosen for it and returns its results.
+
+    The selectivity of a filtered search is the share of ``candidates``, the number of rows passing the filter if it
+    is known, in the estimated number of feature vectors. If a filtered search returns fewer rows than the limit or
+    the number of candidates, it is repeated with a larger ef_search up to SEARCHATTEMPTS times, or until ef_search
+    reaches SEARCHEFMAX or the result stops growing. Searches without a limit do not use the index and run unchanged.
+
+    :param name: The name of the search in the record of the request.
+    :param run: Runs the search on a cursor and returns its results.
+    """
+    if limit is None:
+        return run(cur)
+
+    settings = get_settings()
+    info = bootstrap.get_database_info(cur.connection, cur.connection.info.dbname)
+    if not filtered:
+        selectivity = 1.0
+    elif candidates is not None and info.feature_count:
+        selectivity = min(1.0, candidates / info.feature_count)
+    else:
+        selectivity = UNKNOWN_SELECTIVITY
+    # An index scan returns at most ef_search rows, so unfiltered searches beyond SEARCHEFMAX need iterative scans too
+    iterative_scan = info.supports_iterative_scan and (filtered or needed_ef(limit, settings) > settings['SEARCHEFMAX'])
+    parameters = choose(name, limit, selectivity, iterative_scan, settings)
+    if not parameters.iterative_scan and limit > parameters.ef_search:
+        logger.warning('Search %s for %d rows is limited to ef_search = SEARCHEFMAX = %d rows, iterative index scans '
+                       'need pgvector 0.8', name, limit, parameters.ef_search)
+    expected = limit if candidates is None else min(limit, candidates)
+
+    if parameters.iterative_scan:
+        # Strict order keeps the rows sorted by distance, so that ORDER BY ... LIMIT stays correct
+        cur.execute("SET LOCAL hnsw.iterative_scan = 'strict_order'")
+    while True:
+        cur.execute('SET LOCAL hnsw.ef_search = %s', (parameters.ef_search,))
+        parameters.attempts += 1
+        results = run(cur)
+        previous, parameters.results = parameters.results, len(results)
+        if (not filtered or parameters.iterative_scan or len(results) >= expected
+                or (previous is not None and len(results) <= previous)
+                or parameters.attempts >= settings['SEARCHATTEMPTS']
+                or parameters.ef_search >= settings['SEARCHEFMAX']):
+            break
+        parameters.ef_search = min(parameters.ef_search * EF_GROWTH, settings['SEARCHEFMAX'])
+
+    record(parameters)
+    return results
+
+
+def record(parameters):
+    """Adds search parameters to the record of the current request, if it keeps one."""
+    recorded = _recorded.get()
+    if recorded is not None:
+        recorded.append(parameters)
+
+
+def recorded(fn):
+    """Records the parameters of all index searches of a request and logs them once it is answered.
+
+    The record is kept in a context variable, which sub-queries on worker threads share with the request.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        parameters = []
+        token = _recorded.set(parameters)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _recorded.reset(token)
+            if parameters:
+                logger.info('Search parameters of %s: %s', fn.__name__, [x.to_dict() for x in parameters])
+
+    return wrapper
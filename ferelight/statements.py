@@ -0,0 +1,194 @@
+import re
+import threading
+import time
+
+from ferelight import metrics
+
+
+class Template:
+    """A fixed SQL statement with ``$n`` parameters, prepared once per pooled connection."""
+
+    def __init__(self, name, types, sql):
+        self.name = name
+        self.types = types
+        self.sql = sql
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'seconds': self.seconds,
+                'mean_seconds': self.seconds / self.count if self.count else 0.0,
+                'max_seconds': self.max_seconds,
+            }
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def register(name, types, sql):
+    """Registers a template, or returns the registered one if a template with this name exists.
+
+    :param name: The name of the prepared statement, unique per connection.
+    :param types: The comma-separated PostgreSQL types of the parameters, e.g. ``'vector, bigint'``.
+    :param sql: The statement, with ``$1``, ``$2``, ... for the parameters.
+    :rtype: Template
+    """
+    template = _templates.get(name)
+    if template is None:
+        with _templates_lock:
+            template = _templates.setdefault(name, Template(name, types, sql))
+    return template
+
+
+def execute(cur, name, params=()):
+    """Executes a registered template on the cursor of a pooled connection, preparing it on first use.
+
+    Prepared statements outlive transactions, so each connection prepares each template at most once. ``LIMIT``
+    parameters can be ``None`` for no limit.
+    """
+    template = _templates[name]
+    prepared = cur.connection.prepared
+    if name not in prepared:
+        cur.execute(f'PREPARE {name} ({template.types}) AS {template.sql}')
+        prepared.add(name)
+
+    start = time.perf_counter()
+    cur.execute(f'EXECUTE {name} ({", ".join(["%s"] * len(params))})' if params else f'EXECUTE {name}', params)
+    seconds = time.perf_counter() - start
+    template.record(seconds)
+    metrics.add(f'sql:{name}', seconds)
+
+
+def stream(conn, name, params=(), size=1000):
+    """Yields the rows of a registered template in batches of up to ``size`` rows from a server-side cursor.
+
+    Server-side cursors cannot execute prepared statements, so the template is declared with each ``$n`` replaced by
+    its parameter cast to its type. The connection has to stay in the same transaction until the rows are consumed.
+    """
+    template = _templates[name]
+    types = [x.strip() for x in template.types.split(',')]
+    sql = re.sub(r'\$(\d+)', lambda m: f'%({m.group(1)})s::{types[int(m.group(1)) - 1]}',
+                 template.sql.replace('%', '%%'))
+
+    seconds = 0.0
+    with conn.cursor(f'stream_{name}') as cur:
+        start = time.perf_counter()
+        cur.execute(sql, {str(i): param for i, param in enumerate(params, 1)})
+        while True:
+            rows = cur.fetchmany(size)
+            seconds += time.perf_counter() - start
+            if not rows:
+                break
+            yield rows
+            start = time.perf_counter()
+    template.record(seconds)
+    metrics.add(f'sql:{name}', seconds)
+
+
+def stats():
+    """Returns the execution count and latency of every template by name."""
+    return {name: template.stats() for name, template in list(_templates.items())}
+
+
+register('similarity', 'vector, bigint', """
+    SELECT id, feature <=> $1 AS distance
+    FROM features_openclip
+    ORDER BY distance
+    LIMIT $2
+""")
+
+register('similarity_in_ids', 'vector, text[], bigint', """
+    SELECT id, feature <=> $1 AS distance
+    FROM features_openclip
+    WHERE id = ANY($2)
+    ORDER BY distance
+    LIMIT $3
+""")
+
+register('vectors_in_ids', 'text[]', """
+    SELECT id, vector_send(feature)
+    FROM features_openclip
+    WHERE id = ANY($1)
+""")
+
+register('similarity_excluding', 'vector, text[], bigint', """
+    SELECT id, feature <=> $1 AS distance
+    FROM features_openclip
+    WHERE id <> ALL($2)
+    ORDER BY distance
+    LIMIT $3
+""")
+
+register('segmentbytime', 'text, double precision', """
+    SELECT segmentid
+    FROM cineast_segment
+    WHERE objectid = $1
+    AND $2 BETWEEN segmentstartabs AND segmentendabs
+    ORDER BY segmentstartabs
+    LIMIT 1
+""")
+
+register('segmentsbytime', 'text[], double precision[]', """
+    SELECT s.segmentid
+    FROM unnest($1, $2) WITH ORDINALITY AS q (objectid, timestamp, position)
+    LEFT JOIN LATERAL (
+        SELECT segmentid
+        FROM cineast_segment
+        WHERE objectid = q.objectid
+        AND q.timestamp BETWEEN segmentstartabs AND segmentendabs
+        ORDER BY segmentstartabs
+        LIMIT 1
+    ) s ON true
+    ORDER BY q.position
+""")
+
+register('objectinfo', 'text', """
+    SELECT objectid, mediatype, name, path FROM cineast_multimediaobject WHERE objectid = $1
+""")
+
+register('objectinfos', 'text[]', """
+    SELECT objectid, mediatype, name, path FROM cineast_multimediaobject WHERE objectid = ANY($1)
+""")
+
+register('objectsegments', 'text', """
+    SELECT segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs
+    FROM cineast_segment WHERE objectid = $1
+""")
+
+register('segmentobjects', 'text[]', """
+    SELECT s.segmentid, s.objectid, s.segmentnumber, s.segmentstart, s.segmentend, s.segmentstartabs, s.segmentendabs,
+        o.objectid, o.mediatype, o.name, o.path
+    FROM cineast_segment s LEFT JOIN cineast_multimediaobject o ON o.objectid = s.objectid
+    WHERE s.segmentid = ANY($1)
+""")
+
+register('allobjects', '', """
+    SELECT objectid, mediatype, name, path FROM cineast_multimediaobject
+""")
+
+register('allsegments', '', """
+    SELECT segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs
+    FROM cineast_segment
+""")
+
+register('segmentinfo', 'text', """
+    SELECT segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs
+    FROM cineast_segment WHERE segmentid = $1
+""")
+
+register('segmentinfos', 'text[]', """
+    SELECT segmentid, objectid, segmentnumber, segmentstart, segmentend, segmentstartabs, segmentendabs
+    FROM cineast_segment WHERE segmentid = ANY($1)
+""")
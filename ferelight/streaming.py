@@ -0,0 +1,48 @@
+from flask import Response, current_app, has_app_context, request, stream_with_context
+
+from ferelight import rows
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Rows fetched per round trip and serialized per chunk of a streamed response
+STREAM_DEFAULTS = {
+    'STREAMFETCHSIZE': 1000,
+}
+
+
+def get_fetch_size():
+    config = current_app.config if has_app_context() else {}
+    return config.get('STREAMFETCHSIZE', STREAM_DEFAULTS['STREAMFETCHSIZE'])
+
+
+def requested():
+    """Whether the Accept header of the request prefers NDJSON to JSON."""
+    accept = request.accept_mimetypes
+    return accept[NDJSON_MIMETYPE] > accept['application/json']
+
+
+def lines(batch):
+    """Serializes a list of rows to a chunk of NDJSON, one object per row."""
+    return b''.join(rows.dumps(item) + b'\n' for item in rows.to_dicts(batch))
+
+
+def batched_lines(results):
+    """Serializes a list of rows to chunks of NDJSON with STREAMFETCHSIZE rows each."""
+    size = get_fetch_size()
+    return (lines(results[i:i + size]) for i in range(0, len(results), size))
+
+
+def response(chunks, status=200, headers=None):
+    """Returns a response that sends the chunks as they are produced.
+
+    The first chunk is produced before the response starts, so that errors such as an unknown database still result
+    in an error status instead of a truncated body.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+
+    def generate():
+        yield first
+        yield from chunks
+
+    return Response(stream_with_context(generate()), status=status, headers=headers, mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,41 @@
+import threading
+import unittest
+
+from ferelight.batching import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """MicroBatcher unit tests"""
+
+    def test_merges_concurrent_calls(self):
+        calls = []
+
+        def double(items):
+            calls.append(list(items))
+            return [2 * x for x in items]
+
+        batcher = MicroBatcher(double, window=0.2)
+        results = {}
+        threads = [threading.Thread(target=lambda i=i: results.update({i: batcher([i, i + 10])})) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {i: [2 * i, 2 * (i + 10)] for i in range(4)})
+        self.assertLess(len(calls), 4)
+
+    def test_propagates_errors(self):
+        def fail(items):
+            raise ValueError('broken')
+
+        with self.assertRaises(ValueError):
+            MicroBatcher(fail, window=0.01)(['a'])
+
+    def test_zero_window_calls_directly(self):
+        batcher = MicroBatcher(lambda items: [threading.current_thread().name for _ in items], window=0)
+        self.assertEqual(batcher(['a']), [threading.current_thread().name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+
+from ferelight.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    """LRUCache unit tests"""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_evicts_by_size(self):
+        cache = LRUCache(maxsize=10, maxbytes=5, sizeof=len)
+        cache.put('a', 'xxx')
+        cache.put('b', 'yy')
+        cache.put('c', 'zz')
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.stats()['bytes'], 4)
+        cache.put('d', 'too large')
+        self.assertNotIn('d', cache)
+
+    def test_counts_hits_and_misses(self):
+        cache = LRUCache()
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hitrate']), (1, 1, 0.5))
+
+    def test_expires_entries_after_ttl(self):
+        cache = LRUCache(ttl=10)
+        with mock.patch('time.monotonic', return_value=100):
+            cache.put('a', 1)
+        with mock.patch('time.monotonic', return_value=109):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('time.monotonic', return_value=110):
+            self.assertNotIn('a', cache)
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_remove_if(self):
+        cache = LRUCache()
+        cache.put(('db1', 'a'), 1)
+        cache.put(('db1', 'b'), 2)
+        cache.put(('db2', 'a'), 3)
+        self.assertEqual(cache.remove_if(lambda key: key[0] == 'db1'), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(('db2', 'a'), cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
 import unittest
+from unittest import mock
 
 from flask import json
 
+from ferelight import resultcache
 from ferelight.models.multimediaobject import Multimediaobject  # noqa: E501
+from ferelight.rows import ScoredRow
 from ferelight.test import BaseTestCase
 
 
@@ -24,6 +27,172 @@ class TestDefaultController(BaseTestCase):
         self.assert200(response,
                        'Response body is : ' + response.data.decode('utf-8'))
 
+    def test_ready_get(self):
+        """Test case for ready_get
+
+        Check whether the engine is ready to serve queries.
+        """
+        headers = { 
+            'Accept': 'application/json',
+        }
+        response = self.client.open(
+            '/ready',
+            method='GET',
+            headers=headers)
+        self.assertStatus(response, 503,
+                          'Response body is : ' + response.data.decode('utf-8'))
+        self.assertFalse(response.json['ready'])
+
+    def test_querybyexample_post_without_seeds(self):
+        """Test case for querybyexample_post
+
+        Get the nearest neighbors of one or more segments.
+        """
+        body = {'database': 'database_example', 'limit': 10}
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+        }
+        response = self.client.open(
+            '/querybyexample',
+            method='POST',
+            headers=headers,
+            data=json.dumps(body),
+            content_type='application/json')
+        self.assert400(response,
+                       'Response body is : ' + response.data.decode('utf-8'))
+
+    def test_querybyexample_post_with_negative_limit(self):
+        """Test case for querybyexample_post
+
+        Reject limits below 1.
+        """
+        body = {'database': 'database_example', 'segmentid': 'segmentid_example', 'limit': -1}
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+        }
+        response = self.client.open(
+            '/querybyexample',
+            method='POST',
+            headers=headers,
+            data=json.dumps(body),
+            content_type='application/json')
+        self.assert400(response,
+                       'Response body is : ' + response.data.decode('utf-8'))
+
+    def test_query_post_with_negative_offset(self):
+        """Test case for query_post
+
+        Reject pages before the first result.
+        """
+        body = {'database': 'database_example', 'ocrtext': 'ocrtext_example', 'offset': -5, 'limit': 10}
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+        }
+        response = self.client.open(
+            '/query',
+            method='POST',
+            headers=headers,
+            data=json.dumps(body),
+            content_type='application/json')
+        self.assert400(response,
+                       'Response body is : ' + response.data.decode('utf-8'))
+
+    def test_query_post_with_nprobe_below_one(self):
+        """Test case for query_post
+
+        Reject searching fewer than one inverted list.
+        """
+        body = {'database': 'database_example', 'similaritytext': 'similaritytext_example', 'nprobe': 0}
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+        }
+        response = self.client.open(
+            '/query',
+            method='POST',
+            headers=headers,
+            data=json.dumps(body),
+            content_type='application/json')
+        self.assert400(response,
+                       'Response body is : ' + response.data.decode('utf-8'))
+
+    def test_query_post_with_too_many_similarity_parts(self):
+        """Test case for query_post
+
+        Reject similarity texts with more parts than SIMILARITY_PARTS_MAXIMUM.
+        """
+        body = {'database': 'database_example', 'similaritytext': '#'.join(['part'] * 9)}
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+        }
+        response = self.client.open(
+            '/query',
+            method='POST',
+            headers=headers,
+            data=json.dumps(body),
+            content_type='application/json')
+        self.assert400(response,
+                       'Response body is : ' + response.data.decode('utf-8'))
+
+    def test_query_post_pages(self):
+        """Test case for query_post
+
+        Page through the results of a query with offset and cursors.
+        """
+        resultcache.invalidate()
+        ranking = [ScoredRow(f'segment_{i:02}', 1 - i / 100) for i in range(25)]
+        limits = []
+
+        def search_query(body):
+            limits.append(body.get('limit'))
+            return ranking[:body.get('limit')][::-1]
+
+        def query(body):
+            return self.client.open(
+                '/query',
+                method='POST',
+                headers={'Accept': 'application/json', 'Content-Type': 'application/json'},
+                data=json.dumps(body),
+                content_type='application/json')
+
+        body = {'database': 'database_example', 'ocrtext': 'ocrtext_example'}
+        with mock.patch('ferelight.controllers.default_controller.search_query', side_effect=search_query):
+            pages = [query(dict(body, limit=10))]
+            while 'X-Next-Cursor' in pages[-1].headers:
+                pages.append(query({'cursor': pages[-1].headers['X-Next-Cursor']}))
+            for page in pages:
+                self.assert200(page, 'Response body is : ' + page.data.decode('utf-8'))
+            # The query is searched once, deeply, and its pages are served from the cache
+            self.assertEqual(limits, [500])
+            self.assertEqual(len(pages), 3)
+            self.assertEqual([x['segmentid'] for page in pages for x in page.json[::-1]],
+                             [x.segmentid for x in ranking])
+
+            page = query(dict(body, offset=5, limit=10))
+            self.assertEqual([x['segmentid'] for x in page.json[::-1]], [x.segmentid for x in ranking[5:15]])
+            self.assertEqual(limits, [500])
+
+            # A cursor whose ranking left the cache searches it again with the same depth
+            resultcache.invalidate()
+            page = query({'cursor': pages[0].headers['X-Next-Cursor']})
+            self.assertEqual(limits, [500, 500])
+            self.assertEqual(page.json, pages[1].json)
+
+            # Shallow first pages are searched up to their end and get no cursor, later pages search deeply
+            resultcache.invalidate()
+            self.app.config['RESULTCACHESHALLOW'] = True
+            try:
+                page = query(dict(body, limit=10))
+                self.assertNotIn('X-Next-Cursor', page.headers)
+                page = query(dict(body, offset=10, limit=10))
+            finally:
+                del self.app.config['RESULTCACHESHALLOW']
+            self.assertEqual(limits[2:], [10, 500])
+            self.assertEqual([x['segmentid'] for x in page.json[::-1]], [x.segmentid for x in ranking[10:20]])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from ferelight import fusion
+from ferelight.models.scoredsegment import Scoredsegment
+
+
+def scored(*pairs):
+    return [Scoredsegment(segmentid=segmentid, score=score) for (segmentid, score) in pairs]
+
+
+class TestFuse(unittest.TestCase):
+    """fusion.fuse unit tests"""
+
+    def setUp(self):
+        self.lists = [scored(('a', 0.2), ('b', 0.4), ('z', 0.6)),
+                      scored(('b', 0.8), ('c', 0.1), ('z', 0.2))]
+
+    def test_mean_keeps_segments_of_all_lists(self):
+        result = fusion.fuse(self.lists)
+        self.assertEqual([(x.segmentid, round(x.score, 6)) for x in result], [('z', 0.4), ('b', 0.6)])
+
+    def test_min_and_sum(self):
+        self.assertEqual([x.score for x in fusion.fuse(self.lists, 'min')], [0.2, 0.4])
+        self.assertEqual([round(x.score, 6) for x in fusion.fuse(self.lists, 'sum')], [0.8, 1.2])
+
+    def test_min_count(self):
+        self.assertEqual({x.segmentid for x in fusion.fuse(self.lists, min_count=1)}, {'a', 'b', 'c', 'z'})
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            fusion.fuse(self.lists, 'median')
+
+
+class TestLateFusion(unittest.TestCase):
+    """fusion.reciprocal_rank_fusion and fusion.weighted_fusion unit tests"""
+
+    def setUp(self):
+        self.lists = [scored(('a', 0.9), ('b', 0.5), ('c', 0.1)),
+                      scored(('c', 1), ('b', 1))]
+
+    def test_reciprocal_rank_fusion(self):
+        result = fusion.reciprocal_rank_fusion(self.lists, k=1)
+        self.assertEqual([x.segmentid for x in result], ['a', 'b', 'c'])
+        self.assertAlmostEqual(result[-1].score, 1 / 4 + 1 / 2)
+
+    def test_reciprocal_rank_fusion_weights_and_limit(self):
+        result = fusion.reciprocal_rank_fusion(self.lists, weights=[3, 1], k=0, limit=1)
+        self.assertEqual([(x.segmentid, x.score) for x in result], [('a', 3.0)])
+
+    def test_weighted_fusion(self):
+        result = fusion.weighted_fusion(self.lists, weights=[1, 0.5])
+        self.assertEqual([(x.segmentid, round(x.score, 6)) for x in result], [('c', 0.6), ('a', 0.9), ('b', 1.0)])
+
+    def test_weight_count_must_match(self):
+        with self.assertRaises(ValueError):
+            fusion.weighted_fusion(self.lists, weights=[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
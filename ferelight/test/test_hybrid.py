@@ -0,0 +1,55 @@
+import struct
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ferelight import hybrid
+
+
+def vector_send(vector):
+    return memoryview(struct.pack(f'>hh{len(vector)}f', len(vector), 0, *vector))
+
+
+class TestHybrid(unittest.TestCase):
+    """hybrid unit tests"""
+
+    def setUp(self):
+        self.cur = mock.Mock()
+        self.cur.connection.prepared = set()
+        self.cur.fetchall.return_value = [
+            ('a', vector_send([1.0, 0.0, 0.0])),
+            ('b', vector_send([0.0, 2.0, 0.0])),
+            ('c', vector_send([1.0, 1.0, 0.0])),
+        ]
+
+    def test_fetch_vectors_parses_binary_format(self):
+        segmentids, matrix = hybrid.fetch_vectors(self.cur, ['a', 'b', 'c'])
+        self.assertEqual(segmentids, ['a', 'b', 'c'])
+        np.testing.assert_array_equal(matrix, [[1, 0, 0], [0, 2, 0], [1, 1, 0]])
+        self.assertEqual(matrix.dtype, np.float32)
+
+    def test_exact_search_returns_best_by_ascending_cosine_similarity(self):
+        result = hybrid.exact_search(self.cur, [0.0, 1.0, 0.0], ['a', 'b', 'c'], 2)
+        self.assertEqual([x.segmentid for x in result], ['c', 'b'])
+        self.assertAlmostEqual(result[0].score, np.sqrt(0.5), 6)
+        self.assertAlmostEqual(result[1].score, 1.0, 6)
+
+    def test_exact_search_scores_zero_vectors_as_zero(self):
+        self.cur.fetchall.return_value.append(('d', vector_send([0.0, 0.0, 0.0])))
+        result = hybrid.exact_search(self.cur, [0.0, 1.0, 0.0], ['a', 'b', 'c', 'd'], 4)
+        self.assertEqual({x.segmentid: x.score for x in result}['d'], 0.0)
+        result = hybrid.exact_search(self.cur, [0.0, 0.0, 0.0], ['a', 'b', 'c', 'd'], 4)
+        self.assertEqual([x.score for x in result], [0.0] * 4)
+
+    def test_exact_search_without_candidates(self):
+        self.cur.fetchall.return_value = []
+        self.assertEqual(hybrid.exact_search(self.cur, [0.0, 1.0, 0.0], [], 2), [])
+
+    def test_use_exact_search(self):
+        self.assertTrue(hybrid.use_exact_search(hybrid.DEFAULT_EXACT_MAXIMUM))
+        self.assertFalse(hybrid.use_exact_search(hybrid.DEFAULT_EXACT_MAXIMUM + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
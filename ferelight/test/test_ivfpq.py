@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ferelight import ivfpq
+from ferelight import vectorindex
+
+
+class TestIVFPQIndex(unittest.TestCase):
+    """ivfpq unit tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(20, 16))
+        vectors = (centers[rng.integers(0, 20, 2000)] + 0.5 * rng.normal(size=(2000, 16))).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        cls.directory = tempfile.TemporaryDirectory()
+        np.save(os.path.join(cls.directory.name, 'test.vectors.npy'), vectors)
+        np.save(os.path.join(cls.directory.name, 'test.ids.npy'), np.array([f'v_{i:04}' for i in range(2000)]))
+        ivfpq.build_index(cls.directory.name, 'test', nlist=32, m=4, iterations=5)
+        cls.index = ivfpq.IVFPQIndex(cls.directory.name, 'test', nprobe=4)
+        cls.exact = vectorindex.LocalVectorIndex(cls.directory.name, 'test')
+        cls.query = rng.normal(size=16).astype(np.float32)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_all_lists_without_quantization_match_exact_search(self):
+        # With enough candidates to re-rank, every vector of the probed lists is scored exactly
+        with mock.patch.object(ivfpq, 'RERANK_FACTOR', 1000):
+            self.assertEqual(self.index.search(self.query, 10, nprobe=32), self.exact.search(self.query, 10))
+
+    def test_search_returns_exact_scores(self):
+        result = self.index.search(self.query, 10)
+        self.assertEqual(len(result), 10)
+        self.assertEqual([x.score for x in result], sorted(x.score for x in result))
+        for segment in result:
+            self.assertAlmostEqual(segment.score, self.exact.score(self.query, [segment.segmentid])[0].score, 6)
+
+    def test_search_excludes_segment(self):
+        best = self.index.search(self.query, 1, nprobe=32)[0].segmentid
+        result = self.index.search(self.query, 10, exclude=[best], nprobe=32)
+        self.assertNotIn(best, [x.segmentid for x in result])
+
+    def test_search_rejects_nprobe_below_one(self):
+        for nprobe in (0, -5):
+            with self.assertRaises(ValueError):
+                self.index.search(self.query, 10, nprobe=nprobe)
+
+    def test_recall_grows_with_nprobe(self):
+        report, _ = ivfpq.recall_report(self.directory.name, 'test', [1, 32], queries=20, limit=10)
+        self.assertLess(report[0][1], report[1][1])
+        self.assertGreater(report[1][1], 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from ferelight import metadata
+from ferelight.rows import ObjectRow, SegmentRow
+
+
+class TestMetadataCache(unittest.TestCase):
+    """metadata unit tests"""
+
+    def setUp(self):
+        self.objects = [ObjectRow('o1', 0, 'one', '/o1.mp4'), ObjectRow('o2', 0, None, '/o2.mp4')]
+        self.segments = [
+            SegmentRow('o1_3', 'o1', 3, 50, 74, 2.0, 3.0),
+            SegmentRow('o1_1', 'o1', 1, 0, 24, 0.0, 1.0),
+            SegmentRow('o1_2', 'o1', 2, 25, 49, 1.0, 2.0),
+            SegmentRow('o3_1', 'o3', 1, 0, 9, 0.0, None),
+        ]
+        self.cache = metadata.MetadataCache(self.objects, self.segments)
+
+    def test_objects_in_requested_order(self):
+        self.assertEqual(self.cache.objects(['o2', 'o1', 'o2', 'o3', 'o1_long_unknown_id']), self.objects[::-1])
+        self.assertEqual(self.cache.object_count, 2)
+
+    def test_segments_in_requested_order(self):
+        self.assertEqual(self.cache.segments(['o1_2', 'o1_1', 'unknown']), [self.segments[2], self.segments[1]])
+        self.assertEqual(self.cache.segments(['o3_1']), [self.segments[3]])
+
+    def test_object_segments_ordered_by_start(self):
+        self.assertEqual(self.cache.object_segments('o1'), [self.segments[1], self.segments[2], self.segments[0]])
+        self.assertEqual(self.cache.object_segments('o2'), [])
+        self.assertEqual(self.cache.object_segments('unknown'), [])
+
+    def test_segment_at(self):
+        self.assertEqual(self.cache.segment_at('o1', 0.5), 'o1_1')
+        self.assertEqual(self.cache.segment_at('o1', 2.0), 'o1_2')
+        self.assertIsNone(self.cache.segment_at('o1', 3.5))
+        self.assertIsNone(self.cache.segment_at('unknown', 0.5))
+
+    def test_segments_at(self):
+        self.assertEqual(self.cache.segments_at(['o1', 'o1', 'o3', 'o3', 'unknown'], [2.5, -1.0, 0.0, 5.0, 0.0]),
+                         ['o1_3', None, None, None, None])
+
+    def test_interval_index_with_overlapping_segments(self):
+        # Sorted by start, the long first segment overlaps the two after it
+        index = metadata.IntervalIndex(['a', 'b', 'c', 'd'], [0.0, 1.0, 2.0, None], [5.0, 2.0, 3.0, 4.0])
+        self.assertEqual(index.find(1.5), 'a')
+        self.assertEqual(index.find(5.5), None)
+        index = metadata.IntervalIndex(['a', 'b', 'c'], [0.0, 1.0, 4.0], [0.5, 3.0, 6.0])
+        self.assertEqual([index.find(t) for t in [0.5, 0.7, 1.0, 3.5, 4.0, 6.0, 7.0]],
+                         ['a', None, 'b', None, 'c', 'c', None])
+
+    def test_empty(self):
+        cache = metadata.MetadataCache([], [])
+        self.assertEqual(cache.objects(['o1']), [])
+        self.assertEqual(cache.segments(['o1_1']), [])
+        self.assertIsNone(cache.segment_at('o1', 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
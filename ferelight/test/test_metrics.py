@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from ferelight import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """metrics unit tests"""
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram('test_seconds', 'Test durations.', ('endpoint',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, 'a')
+        histogram.observe(0.1, 'a')
+        histogram.observe(0.5, 'a')
+        histogram.observe(2.0, 'a')
+
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Test durations.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{endpoint="a",le="0.1"} 2',
+            'test_seconds_bucket{endpoint="a",le="1.0"} 3',
+            'test_seconds_bucket{endpoint="a",le="+Inf"} 4',
+            'test_seconds_sum{endpoint="a"} 2.65',
+            'test_seconds_count{endpoint="a"} 4',
+        ])
+
+    def test_recorded_sums_stages_and_logs_request(self):
+        @metrics.recorded
+        def test_endpoint():
+            metrics.annotate(mergetype='rrf', results=2)
+            metrics.add('sql:test', 0.25)
+            metrics.add('sql:test', 0.5)
+            with metrics.span('fusion'):
+                pass
+            return 'Not found', 404
+
+        with mock.patch.object(metrics, 'finish') as finish:
+            self.assertEqual(test_endpoint(), ('Not found', 404))
+        record, seconds, status = finish.call_args.args
+        self.assertEqual(status, 404)
+        self.assertEqual(record.mergetype, 'rrf')
+        self.assertEqual(record.stages['sql:test'], [0.75, 2])
+        self.assertIn('fusion', record.stages)
+        self.assertEqual(record.to_dict(seconds, status)['results'], 2)
+
+    def test_finish_samples_log(self):
+        record = metrics.RequestRecord('test_sampled')
+        app = Flask(__name__)
+        app.config.update(LOGSAMPLERATE=0, LOGSLOWSECONDS=1.0)
+        with app.app_context(), self.assertNoLogs(metrics.logger, 'INFO'):
+            metrics.finish(record, 0.5, 200)
+        with app.app_context(), self.assertLogs(metrics.logger, 'INFO') as logs:
+            metrics.finish(record, 1.5, 200)
+        self.assertIn('"endpoint":"test_sampled"', logs.output[0])
+        self.assertIn('ferelight_request_seconds_count{endpoint="test_sampled",mergetype="none"} 2', metrics.render())
+
+    def test_spans_outside_of_requests_are_ignored(self):
+        with metrics.span('encode'):
+            pass
+        metrics.annotate(mergetype='rrf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import threading
+
+from ferelight.planner import QueryPlan
+from ferelight.test import BaseTestCase
+
+
+class TestQueryPlan(BaseTestCase):
+    """QueryPlan unit tests"""
+
+    def test_runs_each_step_once_after_its_dependencies(self):
+        calls = []
+        lock = threading.Lock()
+
+        def step(name, *dependencies):
+            with lock:
+                calls.append(name)
+            return name + ''.join(dependencies)
+
+        plan = QueryPlan('database')
+        plan.compute('a', step, 'a')
+        plan.compute('b', step, 'b')
+        plan.compute('c', step, 'c', after=('a', 'b'))
+        plan.compute('d', step, 'd', after=('c',))
+        results = plan.run()
+
+        self.assertEqual(results, {'a': 'a', 'b': 'b', 'c': 'cab', 'd': 'dcab'})
+        self.assertEqual(sorted(calls), ['a', 'b', 'c', 'd'])
+        self.assertEqual(calls[2:], ['c', 'd'])
+
+    def test_independent_steps_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+        plan = QueryPlan('database')
+        plan.compute('a', barrier.wait)
+        plan.compute('b', barrier.wait)
+        self.assertEqual(set(plan.run()), {'a', 'b'})
+
+    def test_rejects_unknown_dependencies(self):
+        with self.assertRaises(ValueError):
+            QueryPlan('database').compute('a', print, after=('b',))
+
+    def test_propagates_errors(self):
+        plan = QueryPlan('database')
+        plan.compute('a', lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            plan.run()
@@ -0,0 +1,93 @@
+import time
+import unittest
+from unittest import mock
+
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+
+from ferelight.pool import ConnectionPool
+
+
+class FakeConnection:
+
+    def __init__(self, *args, **kwargs):
+        self.closed = 0
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return mock.MagicMock()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool(unittest.TestCase):
+    """ConnectionPool unit tests"""
+
+    def setUp(self):
+        patcher = mock.patch('ferelight.pool.psycopg2.connect', side_effect=FakeConnection)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuses_returned_connection(self):
+        pool = ConnectionPool('db', {}, minsize=0, maxsize=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_on_connect_runs_once_per_connection(self):
+        on_connect = mock.Mock()
+        pool = ConnectionPool('db', {}, maxsize=1, on_connect=on_connect)
+        for _ in range(3):
+            with pool.connection():
+                pass
+        on_connect.assert_called_once()
+
+    def test_times_out_when_exhausted(self):
+        pool = ConnectionPool('db', {}, minsize=0, maxsize=1, timeout=0.05)
+        conn = pool.getconn()
+        with self.assertRaises(PoolError):
+            pool.getconn()
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+
+    def test_evicts_idle_connections_above_minimum(self):
+        pool = ConnectionPool('db', {}, minsize=1, maxsize=3, idle_timeout=0)
+        conns = [pool.getconn() for _ in range(3)]
+        for conn in conns:
+            pool.putconn(conn)
+        time.sleep(0.01)
+        pool.getconn()
+        self.assertEqual(pool.size, 1)
+        self.assertTrue(conns[0].closed and conns[1].closed)
+
+    def test_replaces_closed_connection(self):
+        pool = ConnectionPool('db', {}, minsize=0, maxsize=1)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.closed = 2
+        self.assertIsNot(pool.getconn(), conn)
+        self.assertEqual(pool.size, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
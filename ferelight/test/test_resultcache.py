@@ -0,0 +1,53 @@
+import unittest
+
+from ferelight import resultcache
+
+
+class TestResultCache(unittest.TestCase):
+    """resultcache unit tests"""
+
+    def setUp(self):
+        resultcache.invalidate()
+
+    def test_cursor_round_trip(self):
+        request = {'database': 'db', 'similaritytext': 'a cat'}
+        cursor = resultcache.encode_cursor(request, 20, 10, 500)
+        self.assertEqual(resultcache.decode_cursor(cursor), (request, 20, 10, 500))
+
+    def test_decode_invalid_cursor(self):
+        for cursor in ['', 'not a cursor', resultcache.encode_cursor({'similaritytext': 'a cat'}, 0, 10, 500),
+                       resultcache.encode_cursor({'database': 'db'}, -1, 10, 500),
+                       resultcache.encode_cursor({'database': 'db', 'similaritytext': 1}, 0, 10, 500),
+                       resultcache.encode_cursor({'database': 'db', 'weights': ['1']}, 0, 10, 500),
+                       resultcache.encode_cursor({'database': 'db', 'unknown': 'x'}, 0, 10, 500),
+                       resultcache.encode_cursor({'database': 'db'}, 0, True, 500),
+                       resultcache.encode_cursor({'database': 'db'}, 0, 10, 0)]:
+            with self.assertRaises(ValueError):
+                resultcache.decode_cursor(cursor)
+
+    def test_covers_and_has_more(self):
+        truncated = resultcache.CachedResult(list(range(500)), 500)
+        self.assertTrue(truncated.covers(500))
+        self.assertFalse(truncated.covers(510))
+        self.assertFalse(truncated.covers(None))
+        self.assertTrue(truncated.has_more(490))
+        # Cursors only page through the ranking they were encoded against
+        self.assertFalse(truncated.has_more(500))
+
+        complete = resultcache.CachedResult(list(range(30)), 500)
+        self.assertTrue(complete.covers(510))
+        self.assertTrue(complete.has_more(20))
+        self.assertFalse(complete.has_more(30))
+
+    def test_key_ignores_order_and_invalidate_is_per_database(self):
+        resultcache.put({'database': 'a', 'ocrtext': 'cat', 'mergetype': 'rrf'}, [1], None)
+        resultcache.put({'database': 'b', 'ocrtext': 'cat'}, [2], None)
+        self.assertEqual(resultcache.get({'mergetype': 'rrf', 'ocrtext': 'cat', 'database': 'a'}).ranked, [1])
+
+        resultcache.invalidate('a')
+        self.assertIsNone(resultcache.get({'database': 'a', 'ocrtext': 'cat', 'mergetype': 'rrf'}))
+        self.assertEqual(resultcache.get({'database': 'b', 'ocrtext': 'cat'}).ranked, [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import json
+import unittest
+from unittest import mock
+
+from ferelight import rows
+
+
+class TestRows(unittest.TestCase):
+    """rows unit tests"""
+
+    def test_to_dicts_leaves_out_null_values(self):
+        self.assertEqual(rows.to_dicts([rows.ObjectRow('o', 0, None, '/o.mp4')]),
+                         [{'objectid': 'o', 'mediatype': 0, 'path': '/o.mp4'}])
+        self.assertEqual(rows.to_dicts([rows.ScoredRow('s', 0.5)]), [{'segmentid': 's', 'score': 0.5}])
+        self.assertEqual(rows.to_dicts([]), [])
+
+    def test_to_dicts_nests_included_rows(self):
+        segment = rows.SegmentRow('s', 'o', 1, 0, 24, 0.0, 1.0)
+        self.assertEqual(rows.to_dicts([rows.DetailedRow('s', 0.5, segment, None)]), [{
+            'segmentid': 's', 'score': 0.5,
+            'segment': {'segmentid': 's', 'objectid': 'o', 'segmentnumber': 1, 'segmentstart': 0, 'segmentend': 24,
+                        'segmentstartabs': 0.0, 'segmentendabs': 1.0},
+        }])
+
+    def test_dumps_without_orjson(self):
+        data = rows.to_dicts([rows.ScoredRow('s', 0.1), rows.ScoredRow('t', 1)])
+        with mock.patch.object(rows, 'orjson', None):
+            self.assertEqual(json.loads(rows.dumps(data)), data)
+        self.assertEqual(json.loads(rows.dumps(data)), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+
+from ferelight import bootstrap
+from ferelight import searchparams
+
+
+def database_info(extension_version='0.7.4', feature_count=10000):
+    return bootstrap.DatabaseInfo('test', extension_version, 1, 2, [], [], feature_count)
+
+
+class TestSearchParameters(unittest.TestCase):
+    """searchparams unit tests"""
+
+    def search(self, counts, info, limit=100, filtered=True, candidates=None):
+        cur = mock.Mock()
+        runs = iter(counts)
+        with mock.patch.object(bootstrap, 'get_database_info', return_value=info):
+            results = searchparams.search(cur, 'test', lambda cur: [None] * next(runs), limit, filtered, candidates)
+        ef_searches = [args[1][0] for args, _ in cur.execute.call_args_list if 'ef_search' in args[0]]
+        return results, ef_searches, cur
+
+    def test_choose_scales_with_limit_selectivity_and_recall(self):
+        settings = dict(searchparams.SEARCH_DEFAULTS)
+        self.assertEqual(searchparams.choose('test', 5, settings=settings).ef_search, 40)
+        self.assertEqual(searchparams.choose('test', 100, settings=settings).ef_search, 131)
+        self.assertEqual(searchparams.choose('test', 100, 0.5, settings=settings).ef_search, 261)
+        self.assertEqual(searchparams.choose('test', 100, 0.01, settings=settings).ef_search, 1000)
+        self.assertEqual(searchparams.choose('test', 100, 0.01, iterative_scan=True, settings=settings).ef_search, 131)
+        settings['SEARCHRECALL'] = 0.99
+        self.assertEqual(searchparams.choose('test', 100, settings=settings).ef_search, 200)
+
+    def test_short_filtered_search_is_retried_with_larger_ef(self):
+        results, ef_searches, _ = self.search([10, 100], database_info(), candidates=5000)
+        self.assertEqual(len(results), 100)
+        self.assertEqual(ef_searches, [261, 1000])
+
+    def test_retries_stop_at_the_maximum_ef(self):
+        results, ef_searches, _ = self.search([10, 60, 100], database_info(), candidates=5000)
+        self.assertEqual(len(results), 60)
+        self.assertEqual(ef_searches, [261, 1000])
+
+    def test_retries_stop_when_the_result_stops_growing(self):
+        # Without a number of candidates, the filter is assumed to pass UNKNOWN_SELECTIVITY of the rows
+        _, ef_searches, _ = self.search([4, 4, 4], database_info(), limit=10)
+        self.assertEqual(ef_searches, [131, 524])
+
+    def test_unfiltered_search_is_not_retried(self):
+        _, ef_searches, _ = self.search([3, 100], database_info(), filtered=False)
+        self.assertEqual(ef_searches, [131])
+
+    def test_iterative_scan_where_supported(self):
+        _, ef_searches, cur = self.search([3, 100], database_info('0.8.0'), candidates=100)
+        self.assertIn(mock.call("SET LOCAL hnsw.iterative_scan = 'strict_order'"), cur.execute.call_args_list)
+        self.assertEqual(ef_searches, [131])
+
+    def test_unfiltered_search_beyond_the_maximum_ef(self):
+        _, ef_searches, cur = self.search([2000], database_info('0.8.0'), limit=2000, filtered=False)
+        self.assertIn(mock.call("SET LOCAL hnsw.iterative_scan = 'strict_order'"), cur.execute.call_args_list)
+        self.assertEqual(ef_searches, [1000])
+
+        with self.assertLogs(searchparams.logger, 'WARNING'):
+            _, ef_searches, cur = self.search([1000], database_info(), limit=2000, filtered=False)
+        self.assertNotIn(mock.call("SET LOCAL hnsw.iterative_scan = 'strict_order'"), cur.execute.call_args_list)
+
+    def test_recorded_keeps_parameters_of_the_request(self):
+        @searchparams.recorded
+        def request():
+            self.search([100], database_info(), filtered=False)
+            return searchparams._recorded.get()
+
+        recorded = request()
+        self.assertEqual([x.to_dict()['ef_search'] for x in recorded], [131])
+        self.assertIsNone(searchparams._recorded.get())
+
+
+if __name__ == '__main__':
+    unittest.main()
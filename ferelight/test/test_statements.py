@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from ferelight import statements
+
+
+class TestStatements(unittest.TestCase):
+    """statements unit tests"""
+
+    def test_prepares_once_per_connection(self):
+        template = statements.register('test_template', 'text, bigint', 'SELECT $1 LIMIT $2')
+        count = template.count
+        cur = mock.Mock()
+        cur.connection.prepared = set()
+
+        statements.execute(cur, 'test_template', ('a', 10))
+        statements.execute(cur, 'test_template', ('b', None))
+
+        self.assertEqual(cur.execute.call_args_list, [
+            mock.call('PREPARE test_template (text, bigint) AS SELECT $1 LIMIT $2'),
+            mock.call('EXECUTE test_template (%s, %s)', ('a', 10)),
+            mock.call('EXECUTE test_template (%s, %s)', ('b', None)),
+        ])
+        self.assertEqual(statements.stats()['test_template']['count'], count + 2)
+
+    def test_stream_declares_template_with_cast_parameters(self):
+        statements.register('test_stream', 'text[], bigint', "SELECT id FROM t WHERE id = ANY($1) AND n % 2 = $2")
+        conn = mock.MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.fetchmany.side_effect = [[('a',), ('b',)], [('c',)], []]
+
+        batches = list(statements.stream(conn, 'test_stream', (['a', 'b', 'c'], 0), size=2))
+
+        self.assertEqual(batches, [[('a',), ('b',)], [('c',)]])
+        conn.cursor.assert_called_once_with('stream_test_stream')
+        cur.execute.assert_called_once_with("SELECT id FROM t WHERE id = ANY(%(1)s::text[]) AND n %% 2 = %(2)s::bigint",
+                                            {'1': ['a', 'b', 'c'], '2': 0})
+        cur.fetchmany.assert_called_with(2)
+        self.assertEqual(statements.stats()['test_stream']['count'], 1)
+
+    def test_register_keeps_existing_template(self):
+        first = statements.register('test_existing', 'text', 'SELECT $1')
+        self.assertIs(statements.register('test_existing', 'text', 'SELECT 2'), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from ferelight import textindex
+from ferelight.textindex import InvertedIndex
+
+
+def rows(texts):
+    """Returns the (ID, lexeme, count) rows of the documents with the given texts."""
+    return [(segmentid, lexeme, text.split().count(lexeme))
+            for segmentid, text in texts.items() for lexeme in set(text.split())]
+
+
+class TestTextindex(unittest.TestCase):
+    """textindex unit tests"""
+
+    def setUp(self):
+        self.texts = {
+            'a': 'cat dog',
+            'b': 'cat cat dog tree',
+            'c': 'cat house',
+            'd': 'dog river',
+        }
+        self.index = InvertedIndex.from_rows(rows(self.texts))
+
+    def test_search_intersects_all_lexemes(self):
+        self.assertEqual(sorted(x.segmentid for x in self.index.search([['cat', 'dog']])), ['a', 'b'])
+        self.assertEqual(self.index.search([['cat', 'boat']]), [])
+        self.assertEqual(self.index.search([[]]), [])
+
+    def test_search_ranks_by_bm25(self):
+        result = self.index.search([['cat']])
+        # Ascending like the other searches, b contains cat twice, a and c are as long as each other
+        self.assertEqual([x.segmentid for x in result][-1], 'b')
+        self.assertEqual(result[0].score, result[1].score)
+        self.assertTrue(all(0 < x.score < 1 for x in result))
+        self.assertEqual([x.segmentid for x in self.index.search([['cat']], limit=1)], ['b'])
+
+    def test_search_unites_languages(self):
+        result = self.index.search([['house'], ['river']])
+        self.assertEqual(sorted(x.segmentid for x in result), ['c', 'd'])
+
+    def test_replace_matches_index_of_current_rows(self):
+        changed = dict(self.texts, b='boat', e='boat cat')
+        del changed['c']
+        replaced = self.index.replace(['b', 'c', 'e'], InvertedIndex.from_rows(rows({'b': 'boat', 'e': 'boat cat'})))
+        rebuilt = InvertedIndex.from_rows(rows(changed))
+
+        for lexemes in (['cat'], ['boat'], ['dog'], ['cat', 'boat'], ['house']):
+            self.assertEqual(sorted(replaced.search([lexemes])), sorted(rebuilt.search([lexemes])))
+
+    def test_websearch_syntax_is_searched_in_database(self):
+        self.assertIsNone(textindex.parse(None, 'features_asr', '"big cat"'))
+        self.assertIsNone(textindex.parse(None, 'features_asr', 'cat -dog'))
+        self.assertIsNone(textindex.parse(None, 'features_asr', 'cat or dog'))
+
+
+if __name__ == '__main__':
+    unittest.main()
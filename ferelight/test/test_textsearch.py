@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from ferelight import statements
+from ferelight import textsearch
+
+
+class TestTextsearch(unittest.TestCase):
+    """textsearch unit tests"""
+
+    def setUp(self):
+        self.cur = mock.Mock()
+        self.cur.connection.prepared = set()
+
+    def test_tsquery_defaults_to_configuration_of_database(self):
+        self.assertEqual(textsearch.tsquery(1, 3, 0), 'plainto_tsquery($1)')
+
+    def test_tsquery_combines_languages(self):
+        self.assertEqual(textsearch.tsquery(2, 4, 2), 'plainto_tsquery($4, $2) || plainto_tsquery($5, $2)')
+
+    def test_search_passes_configured_languages(self):
+        app = Flask(__name__)
+        app.config['TEXTSEARCHLANGUAGES'] = ['english', 'german']
+        with app.app_context():
+            textsearch.search(self.cur, 'features_ocr', 'cats', 10)
+
+        template = statements._templates['features_ocr_ranked_2']
+        self.assertEqual(template.types, 'text, bigint, regconfig, regconfig')
+        self.assertIn('ts_rank_cd(feature, query, 32)', template.sql)
+        self.assertIn('ORDER BY distance', template.sql)
+        self.cur.execute.assert_called_with('EXECUTE features_ocr_ranked_2 (%s, %s, %s, %s)',
+                                            ('cats', 10, 'english', 'german'))
+
+    def test_transcripts_are_parsed_as_web_search(self):
+        textsearch.search(self.cur, 'features_asr', '"big cat"', 10)
+
+        template = statements._templates['features_asr_ranked_0']
+        self.assertIn('FROM features_asr, (SELECT websearch_to_tsquery($1) AS query)', template.sql)
+        self.cur.execute.assert_called_with('EXECUTE features_asr_ranked_0 (%s, %s)', ('"big cat"', 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ferelight import vectorindex
+
+
+class TestLocalVectorIndex(unittest.TestCase):
+    """vectorindex unit tests"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(100, 8)).astype(np.float32)
+        self.vectors /= np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.ids = np.array([f'v_{i:03}' for i in range(100)])
+        self.directory = tempfile.TemporaryDirectory()
+        np.save(os.path.join(self.directory.name, 'test.vectors.npy'), self.vectors)
+        np.save(os.path.join(self.directory.name, 'test.ids.npy'), self.ids)
+        self.index = vectorindex.LocalVectorIndex(self.directory.name, 'test')
+        self.query = rng.normal(size=8).astype(np.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected(self, rows):
+        scores = self.vectors[rows] @ (self.query / np.linalg.norm(self.query))
+        order = np.argsort(scores)
+        return [self.ids[rows][i] for i in order]
+
+    def test_search_matches_brute_force(self):
+        # Blocks smaller than the index make the search merge the best rows of several blocks
+        with mock.patch.object(vectorindex, 'BLOCK_SIZE', 16):
+            result = self.index.search(self.query, 10)
+        self.assertEqual([x.segmentid for x in result], self.expected(np.arange(100))[-10:])
+        self.assertEqual([x.score for x in result], sorted(x.score for x in result))
+
+    def test_search_excludes_segment(self):
+        best = self.index.search(self.query, 1)[0].segmentid
+        result = self.index.search(self.query, 5, exclude=[best])
+        self.assertEqual(len(result), 5)
+        self.assertNotIn(best, [x.segmentid for x in result])
+
+    def test_score_skips_unknown_ids(self):
+        result = self.index.score(self.query, ['v_005', 'v_050', 'v_005', 'unknown'], 10)
+        self.assertEqual([x.segmentid for x in result], self.expected(np.array([5, 50])))
+
+    def test_vector(self):
+        np.testing.assert_array_equal(self.index.vector('v_042'), self.vectors[42])
+        self.assertIsNone(self.index.vector('unknown'))
+
+    def test_rows_compare_full_ids(self):
+        # IDs longer than the stored ones must not match the stored IDs they start with
+        self.assertEqual(len(self.index.rows(['v_042X'])), 0)
+        self.assertIsNone(self.index.vector('v_042ZZZ'))
+        self.assertEqual(self.index.rows(['v_042', 'v_0421']).tolist(), [42])
+
+
+if __name__ == '__main__':
+    unittest.main()
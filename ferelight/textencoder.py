@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+
+from flask import current_app
+
+from ferelight.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'xlm-roberta-base-ViT-B-32'
+DEFAULT_PRETRAINED = 'laion5b_s13b_b90k'
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+class TextEncoder:
+    """The text tower of an open_clip model, loaded on first use or by a background warm-up.
+
+    Encode calls of concurrent requests are merged into one forward pass by a ``MicroBatcher``.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, pretrained=DEFAULT_PRETRAINED, batch_window=0.005,
+                 max_batch_size=64):
+        self.model_name = model_name
+        self.pretrained = pretrained
+        self.model = None
+        self.tokenizer = None
+        self.error = None
+        self.batcher = MicroBatcher(self.encode, window=batch_window, max_batch_size=max_batch_size,
+                                    name='text-encoder')
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def load(self):
+        if self._ready.is_set():
+            return
+        with self._lock:
+            if self._ready.is_set():
+                return
+            import open_clip
+
+            logger.info('Loading text encoder %s (%s)', self.model_name, self.pretrained)
+            try:
+                try:
+                    model = load_text_tower(self.model_name, self.pretrained)
+                except (ImportError, AttributeError, KeyError, RuntimeError):
+                    # load_text_tower uses internals of open_clip that may change between its versions
+                    logger.exception('Could not load the text tower of %s alone', self.model_name)
+                    model = None
+                if model is None:
+                    logger.info('Loading the whole model %s, its text tower cannot be loaded alone', self.model_name)
+                    clip = open_clip.create_model(self.model_name, pretrained=self.pretrained)
+                    del clip.visual
+                    model = clip.encode_text
+                    clip.eval()
+                else:
+                    model.eval()
+                self.tokenizer = open_clip.get_tokenizer(self.model_name)
+                self.model = model
+            except Exception as e:
+                self.error = e
+                raise
+            self.error = None
+            self._ready.set()
+            logger.info('Text encoder %s is ready', self.model_name)
+
+    def warm_up(self):
+        """Loads the model on a background thread and returns immediately."""
+
+        def load():
+            try:
+                self.load()
+            except Exception:
+                logger.exception('Warm-up of text encoder %s failed', self.model_name)
+
+        threading.Thread(target=load, name='text-encoder-warm-up', daemon=True).start()
+
+    def encode(self, inputs):
+        """Encodes a list of texts in one forward pass and returns their normalized embeddings."""
+        import torch
+
+        self.load()
+        # Concurrent requests may ask for the same text within one batch window
+        unique = list(dict.fromkeys(inputs))
+        text = self.tokenizer(unique)
+        with torch.no_grad():
+            text_features = self.model(text)
+            text_features /= text_features.norm(dim=-1, keepdim=True)
+            vectors = text_features.cpu().numpy()
+        # Each embedding is copied out of the batch, which a cached row view would keep alive as a whole. The copies
+        # are shared between requests and must not be modified in place.
+        encoded = {x: vector.copy() for x, vector in zip(unique, vectors)}
+        for vector in encoded.values():
+            vector.flags.writeable = False
+        return [encoded[x] for x in inputs]
+
+
+def load_text_tower(model_name, pretrained):
+    """Builds only the text tower of an open_clip model and loads only its weights from the checkpoint.
+
+    The tower maps tokens to the same features as ``encode_text`` of the whole model. Returns None for models whose
+    text tower cannot be built alone, OpenAI's TorchScript checkpoints, CoCa models and models from the hub or a
+    directory, which are loaded whole.
+    """
+    from open_clip.factory import get_model_config, load_state_dict
+    from open_clip.model import _build_text_tower, convert_to_custom_text_state_dict
+    from open_clip.pretrained import download_pretrained, get_pretrained_cfg
+
+    config = get_model_config(model_name)
+    if config is None or 'multimodal_cfg' in config or pretrained == 'openai':
+        return None
+    pretrained_cfg = get_pretrained_cfg(model_name, pretrained)
+    if pretrained_cfg:
+        checkpoint = download_pretrained(pretrained_cfg)
+    elif pretrained and os.path.isfile(pretrained):
+        checkpoint = pretrained
+    else:
+        return None
+
+    text_cfg = dict(config['text_cfg'])
+    if 'hf_model_name' in text_cfg:
+        # The weights of the Hugging Face model come with the checkpoint
+        text_cfg['hf_model_pretrained'] = False
+    tower = _build_text_tower(config['embed_dim'], text_cfg, config.get('quick_gelu', False))
+
+    if str(checkpoint).endswith('.safetensors'):
+        from safetensors import safe_open
+
+        with safe_open(checkpoint, framework='pt') as f:
+            state_dict = {key: f.get_tensor(key) for key in f.keys() if not key.startswith('visual.')}
+    else:
+        # Pickled checkpoints can only be read whole, the image tower's tensors are dropped right away
+        state_dict = load_state_dict(checkpoint)
+    # Checkpoints of CLIP models keep the text tower at the top level, like the old format of custom text models
+    state_dict = convert_to_custom_text_state_dict(state_dict)
+    state_dict = {key[len('text.'):]: value for key, value in state_dict.items() if key.startswith('text.')}
+    # Text transformers no longer expect position_ids after transformers 4.31
+    if 'transformer.embeddings.position_ids' not in tower.state_dict():
+        state_dict.pop('transformer.embeddings.position_ids', None)
+    tower.load_state_dict(state_dict)
+    return tower
+
+
+def configure(config):
+    """Creates the text encoder from the CLIP* and ENCODEBATCH* keys of the configuration."""
+    global _encoder
+    with _encoder_lock:
+        _encoder = _create(config)
+    return _encoder
+
+
+def get_text_encoder():
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = _create(current_app.config)
+    return _encoder
+
+
+def _create(config):
+    return TextEncoder(model_name=config.get('CLIPMODEL', DEFAULT_MODEL),
+                       pretrained=config.get('CLIPPRETRAINED', DEFAULT_PRETRAINED),
+                       batch_window=float(config.get('ENCODEBATCHWINDOW', 0.005)),
+                       max_batch_size=int(config.get('ENCODEBATCHSIZE', 64)))
@@ -0,0 +1,291 @@
+import logging
+import math
+import re
+import threading
+import time
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from ferelight import metrics
+from ferelight import pool
+from ferelight import statements
+from ferelight import textsearch
+from ferelight.cache import LRUCache
+from ferelight.rows import ScoredRow
+
+logger = logging.getLogger(__name__)
+
+# The tsvector tables that are indexed for a database whose TEXTINDEX is local
+TABLES = ('features_ocr', 'features_asr')
+
+# BM25 parameters, the saturation of repeated terms and how much scores are normalized by the document length
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Web search syntax that the conjunctive queries of the index cannot answer, quoted phrases, or and exclusions
+WEBSEARCH_OPERATORS = re.compile(r'"|(?:^|\s)-\S|\sor\s', re.IGNORECASE)
+
+_indexes = {}
+_loading = set()
+_lock = threading.Lock()
+
+# Lexemes of query texts keyed by (database, languages, text), parsed by the database with the text search
+# configurations the tables were built with
+_lexemes = LRUCache(maxsize=4096)
+metrics.register_cache('text_lexemes', lambda: _lexemes)
+
+
+class InvertedIndex:
+    """The lexemes of a tsvector table as posting lists, for BM25 ranked conjunctive queries.
+
+    Documents are the rows of the table, numbered by their position in ``ids``. The postings of the lexeme with number
+    t are the documents ``documents[offsets[t]:offsets[t + 1]]`` in ascending order, with the number of occurrences
+    of the lexeme in each in ``frequencies``, so that each list is intersected by binary search.
+    """
+
+    def __init__(self, ids, lexemes, documents, terms, counts):
+        """Builds the index from (document, term, count) triples, with the documents and terms as numbers.
+
+        :param ids: The ID of each document.
+        :param lexemes: The lexeme of each term.
+        :param documents: The documents of the triples, the same document and term can occur more than once.
+        """
+        self.ids = np.asarray(ids, dtype=bytes)
+        self.lexemes = list(lexemes)
+        self.vocabulary = {lexeme: term for term, lexeme in enumerate(self.lexemes)}
+        documents = np.asarray(documents, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+
+        keys, inverse = np.unique(np.asarray(terms, dtype=np.int64) * len(self.ids) + documents,
+                                  return_inverse=True)
+        self.documents = (keys % max(len(self.ids), 1)).astype(np.int32)
+        self.frequencies = np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int32)
+        self.offsets = np.searchsorted(keys // max(len(self.ids), 1), np.arange(len(self.lexemes) + 1))
+        self.lengths = np.bincount(documents, weights=counts, minlength=len(self.ids)).astype(np.float32)
+        self.average_length = float(self.lengths.mean()) if len(self.ids) else 0.0
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds the index from (ID, lexeme, count) rows."""
+        if not rows:
+            return cls([], [], [], [], [])
+        ids, lexemes, counts = zip(*rows)
+        ids, documents = np.unique(np.array([x.encode() for x in ids], dtype=bytes), return_inverse=True)
+        lexemes, terms = np.unique(np.array(lexemes, dtype=str), return_inverse=True)
+        return cls(ids, lexemes.tolist(), documents, terms, counts)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def postings(self, term):
+        return self.documents[self.offsets[term]:self.offsets[term + 1]]
+
+    def match(self, lexemes):
+        """Returns the documents that contain all lexemes and the number of occurrences of each lexeme in them."""
+        terms = [self.vocabulary.get(lexeme) for lexeme in dict.fromkeys(lexemes)]
+        if not terms or None in terms:
+            return np.empty(0, dtype=np.int32), []
+        # Starting with the shortest list, every further list is only searched for the remaining documents
+        terms.sort(key=lambda term: self.offsets[term + 1] - self.offsets[term])
+        candidates = self.postings(terms[0])
+        for term in terms[1:]:
+            postings = self.postings(term)
+            positions = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+            candidates = candidates[postings[positions] == candidates]
+            if not len(candidates):
+                break
+        frequencies = [self.frequencies[self.offsets[term] + np.searchsorted(self.postings(term), candidates)]
+                       for term in terms]
+        return candidates, [(term, frequency) for term, frequency in zip(terms, frequencies)]
+
+    def bm25(self, documents, matches):
+        """Returns the BM25 score of each document for the matched terms and their frequencies."""
+        scores = np.zeros(len(documents), dtype=np.float64)
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[documents] / self.average_length)
+        for term, frequency in matches:
+            df = self.offsets[term + 1] - self.offsets[term]
+            idf = math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+            scores += idf * frequency * (BM25_K1 + 1) / (frequency + norms)
+        return scores
+
+    def search(self, queries, limit=None):
+        """Returns the ``limit`` best documents matching all lexemes of any of the queries, by ascending score.
+
+        Each query is the lexemes of the text in one language, a document matching several of them keeps its best
+        score. Scores are BM25 scores s normalized to s / (s + 1), like the ranks of textsearch.
+        """
+        documents, scores = [], []
+        for lexemes in queries:
+            matched, matches = self.match(lexemes)
+            documents.append(matched)
+            scores.append(self.bm25(matched, matches))
+        documents = np.concatenate(documents) if documents else np.empty(0, dtype=np.int32)
+        scores = np.concatenate(scores) if scores else np.empty(0)
+
+        order = np.argsort(-scores, kind='stable')
+        documents, first = np.unique(documents[order], return_index=True)
+        scores = scores[order][first]
+        if limit is not None and limit < len(documents):
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            documents, scores = documents[best], scores[best]
+        order = np.lexsort((-documents, scores))
+        scores = scores[order] / (scores[order] + 1)
+        return list(map(ScoredRow, [x.decode() for x in self.ids[documents[order]].tolist()], scores.tolist()))
+
+    def replace(self, segmentids, index):
+        """Returns a new index with the documents with the given IDs replaced by the ones of ``index``.
+
+        Documents that are not in ``index`` are removed, so that ``index`` holds the current rows of the IDs.
+        """
+        kept = ~np.isin(self.ids, np.array([x.encode() for x in segmentids], dtype=bytes))
+        numbers = np.cumsum(kept) - 1
+        terms = np.repeat(np.arange(len(self.lexemes)), np.diff(self.offsets))
+        old = kept[self.documents]
+
+        lexemes = list(self.lexemes)
+        vocabulary = dict(self.vocabulary)
+        for lexeme in index.lexemes:
+            if lexeme not in vocabulary:
+                vocabulary[lexeme] = len(lexemes)
+                lexemes.append(lexeme)
+        new_terms = np.repeat(np.array([vocabulary[x] for x in index.lexemes], dtype=np.int64),
+                              np.diff(index.offsets))
+
+        # The documents of index are numbered after the kept ones
+        ids = np.concatenate([self.ids[kept], index.ids]).astype(bytes)
+        return InvertedIndex(ids, lexemes,
+                             np.concatenate([numbers[self.documents[old]], index.documents + int(kept.sum())]),
+                             np.concatenate([terms[old], new_terms]),
+                             np.concatenate([self.frequencies[old], index.frequencies]))
+
+
+def terms_template(table, in_ids=False):
+    """Registers the statement that reads the lexemes of each row of a tsvector table, optionally of some IDs."""
+    name = f'{table}_terms_in_ids' if in_ids else f'{table}_terms'
+    statements.register(name, 'text[]' if in_ids else '', f"""
+    SELECT t.id, u.lexeme, coalesce(array_length(u.positions, 1), 1)
+    FROM {table} t, unnest(t.feature) u
+    {'WHERE t.id = ANY($1)' if in_ids else ''}
+""")
+    return name
+
+
+def lexemes_template(languages):
+    """Registers the statement that parses a text into its lexemes in each language, like plainto_tsquery."""
+    name = f'textindex_lexemes_{languages}'
+    columns = ', '.join(f'tsvector_to_array(to_tsvector(${2 + i}, $1))' for i in range(languages))
+    statements.register(name, ', '.join(['text'] + ['regconfig'] * languages), f"""
+    SELECT {columns or 'tsvector_to_array(to_tsvector($1))'}
+""")
+    return name
+
+
+def load(database, table, segmentids=None):
+    """Reads the lexemes of all rows of a table, or of the rows with the given IDs, and indexes them."""
+    with pool.get_connection(database) as conn:
+        if segmentids is None:
+            batches = statements.stream(conn, terms_template(table), size=10000)
+        else:
+            batches = statements.stream(conn, terms_template(table, True), (list(segmentids),), size=10000)
+        return InvertedIndex.from_rows([row for batch in batches for row in batch])
+
+
+def get_backend(database):
+    config = current_app.config if has_app_context() else {}
+    return config.get('TEXTINDEX', {}).get(database, 'postgres')
+
+
+def get_index(database, table):
+    """Returns the text index of a table if TEXTINDEX selects it for the database, loading it on first use.
+
+    None is returned to search the table in the database instead, also while another request loads the index and
+    after loading failed, until the next refresh.
+    """
+    key = (database, table)
+    if key in _indexes:
+        return _indexes[key]
+    if get_backend(database) != 'local':
+        return None
+
+    with _lock:
+        if key in _indexes or key in _loading:
+            return _indexes.get(key)
+        _loading.add(key)
+    index = None
+    try:
+        start = time.perf_counter()
+        index = load(database, table)
+        logger.info('Indexed %d rows of %s in database %s in %.2f s', len(index), table, database,
+                    time.perf_counter() - start)
+    except Exception:
+        logger.exception('Could not index %s in database %s, searching it in the database until it is refreshed',
+                         table, database)
+    finally:
+        with _lock:
+            _loading.discard(key)
+            _indexes[key] = index
+    return index
+
+
+def refresh(database, segmentids=None):
+    """Indexes the tables of a database again, or only the rows with the given IDs, and returns the new indexes.
+
+    The previous indexes are used until the new ones are built. Rows of the given IDs that no longer exist are removed
+    from the index.
+    """
+    indexes = {}
+    for table in TABLES:
+        index = _indexes.get((database, table))
+        if segmentids is None or index is None:
+            index = load(database, table)
+        else:
+            index = index.replace(segmentids, load(database, table, segmentids))
+        with _lock:
+            _indexes[(database, table)] = index
+        indexes[table] = index
+    return indexes
+
+
+def load_databases(databases):
+    """Builds the text indexes of the given databases at startup if TEXTINDEX selects them."""
+    for database in databases:
+        if get_backend(database) != 'local':
+            continue
+        try:
+            refresh(database)
+        except Exception:
+            logger.exception('Could not index the text of database %s, indexing it when it is first queried', database)
+
+
+def invalidate(database=None):
+    """Drops the text indexes of one or all databases, so that they are built again on their next use."""
+    with _lock:
+        for key in [key for key in _indexes if database is None or key[0] == database]:
+            del _indexes[key]
+
+
+def parse(cur, table, text):
+    """Returns the lexemes of a text in each configured language, or None if the index cannot answer it."""
+    if textsearch.QUERY_PARSERS[table] == 'websearch_to_tsquery' and WEBSEARCH_OPERATORS.search(text):
+        return None
+    languages = textsearch.get_languages()
+    key = (cur.connection.info.dbname, tuple(languages), text)
+    lexemes = _lexemes.get(key)
+    if lexemes is None:
+        statements.execute(cur, lexemes_template(len(languages)), (text, *languages))
+        lexemes = [list(column) for column in cur.fetchone()]
+        _lexemes.put(key, lexemes)
+    return lexemes
+
+
+def search(cur, table, text, limit):
+    """Searches the text index of a table, returns None if the table has to be searched in the database instead."""
+    index = get_index(cur.connection.info.dbname, table)
+    if index is None:
+        return None
+    queries = parse(cur, table, text)
+    if queries is None:
+        return None
+    with metrics.span('textindex'):
+        return index.search(queries, limit)
@@ -0,0 +1,95 @@
+from flask import current_app, has_app_context
+
+from ferelight import statements
+
+# ts_rank_cd normalization that maps a rank r to r / (r + 1), so that scores lie in [0, 1) like cosine similarities
+RANK_NORMALIZATION = 32
+
+# The function that parses the query texts of each table. Transcripts are searched with web search syntax, which
+# matches quoted phrases as phrases, ``or`` alternatives and excludes words prefixed with ``-``.
+QUERY_PARSERS = {
+    'features_ocr': 'plainto_tsquery',
+    'features_asr': 'websearch_to_tsquery',
+}
+
+
+def get_languages():
+    """Returns the text search configurations queries are parsed with, none for the database's default one."""
+    config = current_app.config if has_app_context() else {}
+    return list(config.get('TEXTSEARCHLANGUAGES', []))
+
+
+def tsquery(text, first_language, languages, parser='plainto_tsquery'):
+    """Returns the SQL of the tsquery of the text parameter, as the disjunction of its query in each language.
+
+    :param text: The number of the text parameter.
+    :param first_language: The number of the parameter of the first language, the others follow it.
+    :param languages: The number of languages, 0 for the default configuration of the database.
+    :param parser: The function that parses the text, see QUERY_PARSERS.
+    """
+    if not languages:
+        return f'{parser}(${text})'
+    return ' || '.join(f'{parser}(${first_language + i}, ${text})' for i in range(languages))
+
+
+def ranked_template(table, languages):
+    """Registers the search of a tsvector table for the best ranked matches of a text in a number of languages.
+
+    The parameters are the text, the limit and the languages. Every match is ranked with ts_rank_cd, which ranks
+    matches higher the closer together their words are. With the limit, the sort only keeps the best ones, and the
+    matches themselves are found with the GIN index on ``feature``. The rank is returned as 1 - distance, like the
+    distances of the vector searches.
+    """
+    name = f'{table}_ranked_{languages}'
+    statements.register(name, ', '.join(['text', 'bigint'] + ['regconfig'] * languages), f"""
+    SELECT id, 1 - ts_rank_cd(feature, query, {RANK_NORMALIZATION}) AS distance
+    FROM {table}, (SELECT {tsquery(1, 3, languages, QUERY_PARSERS[table])} AS query) AS q
+    WHERE feature @@ query
+    ORDER BY distance, id
+    LIMIT $2
+""")
+    return name
+
+
+def ids_template(table, languages):
+    """Registers the search of a tsvector table for the IDs of up to a limit of matches, see ranked_template."""
+    name = f'{table}_ids_{languages}'
+    statements.register(name, ', '.join(['text', 'bigint'] + ['regconfig'] * languages), f"""
+    SELECT id
+    FROM {table}
+    WHERE feature @@ ({tsquery(1, 3, languages, QUERY_PARSERS[table])})
+    LIMIT $2
+""")
+    return name
+
+
+def similarity_template(table, languages):
+    """Registers the kNN search of a vector among the segments matching a text in a tsvector table.
+
+    The parameters are the vector, the text, the limit and the languages.
+    """
+    name = f'similarity_in_{table}_{languages}'
+    statements.register(name, ', '.join(['vector', 'text', 'bigint'] + ['regconfig'] * languages), f"""
+    SELECT id, feature <=> $1 AS distance
+    FROM features_openclip
+    WHERE id IN (
+        SELECT id
+        FROM {table}
+        WHERE feature @@ ({tsquery(2, 4, languages, QUERY_PARSERS[table])})
+    )
+    ORDER BY distance
+    LIMIT $3
+""")
+    return name
+
+
+def search(cur, table, text, limit):
+    """Executes the ranked search of a text in a tsvector table, in the configured languages."""
+    languages = get_languages()
+    statements.execute(cur, ranked_template(table, len(languages)), (text, limit, *languages))
+
+
+def search_ids(cur, table, text, limit):
+    """Executes the search for the IDs of up to ``limit`` matches of a text in a tsvector table."""
+    languages = get_languages()
+    statements.execute(cur, ids_template(table, len(languages)), (text, limit, *languages))
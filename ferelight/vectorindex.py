@@ -0,0 +1,262 @@
+import argparse
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from ferelight.rows import ScoredRow
+
+logger = logging.getLogger(__name__)
+
+# Rows per matrix product, bounds the float32 copy of a block to a few MB for 512-dimensional vectors
+BLOCK_SIZE = 8192
+EXPORT_BATCH_SIZE = 10000
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class LocalVectorIndex:
+    """A read-only, memory-mapped copy of the features_openclip table of one database.
+
+    The vectors are stored L2-normalized, so that their dot product with a normalized query is the cosine similarity
+    that pgvector's ``<=>`` operator turns into a distance. Because the files are memory-mapped, all worker processes
+    on a machine share one copy of them in the page cache.
+    """
+
+    def __init__(self, directory, database):
+        prefix = os.path.join(directory, database)
+        self.database = database
+        self.vectors = np.load(prefix + '.vectors.npy', mmap_mode='r')
+        self.ids = np.load(prefix + '.ids.npy', mmap_mode='r')
+        if len(self.vectors) != len(self.ids):
+            raise ValueError(f'Vector index of database {database} has {len(self.vectors)} vectors but '
+                             f'{len(self.ids)} IDs')
+        self._order = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, limit=None, exclude=None, nprobe=None):
+        """Returns the ``limit`` segments most similar to ``query``, sorted by ascending score like evaluate_cursor.
+
+        :param query: The query vector.
+        :param limit: The number of segments to return, all if not given.
+        :param exclude: Segment IDs to leave out of the result.
+        :param nprobe: The number of inverted lists an approximate index searches, ignored by the exact index.
+        :rtype: List[ScoredRow]
+        """
+        return self.segments(*self.nearest(query, limit, exclude, nprobe))
+
+    def score(self, query, segmentids, limit=None):
+        """Returns the ``limit`` best of the given segments for ``query``, sorted by ascending score."""
+        rows = np.unique(self.rows(segmentids))
+        scores = self.similarities(rows, [query])[:, 0]
+        order = np.argsort(-scores, kind='stable')[:limit]
+        return self.segments(rows[order], scores[order])
+
+    def nearest(self, query, limit=None, exclude=None, nprobe=None):
+        """Returns the rows of the ``limit`` vectors most similar to ``query`` and their scores, best first.
+
+        The vectors are scanned in blocks of BLOCK_SIZE rows, keeping only the best ``limit`` rows of each block, so
+        that the memory needed does not grow with the size of the index.
+        """
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        excluded = self.rows(exclude) if exclude else None
+        k = len(self) if limit is None else limit + (0 if excluded is None else len(excluded))
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self), BLOCK_SIZE):
+            scores = np.asarray(self.vectors[start:start + BLOCK_SIZE], dtype=np.float32) @ query
+            rows = np.arange(start, start + len(scores))
+            if k < len(scores):
+                top = np.argpartition(scores, -k)[-k:]
+                scores, rows = scores[top], rows[top]
+            best_scores = np.concatenate((best_scores, scores))
+            best_rows = np.concatenate((best_rows, rows))
+            if k < len(best_scores):
+                top = np.argpartition(best_scores, -k)[-k:]
+                best_scores, best_rows = best_scores[top], best_rows[top]
+
+        if excluded is not None:
+            keep = ~np.isin(best_rows, excluded)
+            best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = np.argsort(-best_scores, kind='stable')[:limit]
+        return best_rows[order], best_scores[order]
+
+    def similarities(self, rows, queries):
+        """Returns the scores of the given rows against each query, one column per query."""
+        queries = _normalize(np.asarray(queries, dtype=np.float32))
+        return np.asarray(self.vectors[rows], dtype=np.float32) @ queries.T
+
+    def segments(self, rows, scores):
+        """Turns rows and their scores, best first, into scored segments sorted by ascending score."""
+        return list(map(ScoredRow, self.ids[rows[::-1]].tolist(), scores[::-1].tolist()))
+
+    def vector(self, segmentid):
+        row = self.row(segmentid)
+        return None if row is None else np.asarray(self.vectors[row], dtype=np.float32)
+
+    def row(self, segmentid):
+        rows = self.rows([segmentid])
+        return int(rows[0]) if len(rows) else None
+
+    def rows(self, segmentids):
+        """Returns the rows of the given segment IDs, IDs that are not in the index are skipped."""
+        if self._order is None:
+            order = np.argsort(self.ids)
+            self._sorted_ids = self.ids[order]
+            self._order = order
+        keys = np.asarray(segmentids, dtype=str)
+        if not len(self) or not len(keys):
+            return np.empty(0, dtype=np.int64)
+        # Keys longer than the IDs are cut to their length for the search, comparing the full keys rules them out
+        positions = np.clip(np.searchsorted(self._sorted_ids, keys.astype(self.ids.dtype)), 0, len(self) - 1)
+        found = self._sorted_ids[positions] == keys
+        return self._order[positions[found]]
+
+
+def _normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def export_index(conn, directory, database, dtype='float16'):
+    """Exports the features_openclip table of a database into ``<directory>/<database>.vectors.npy`` and ``.ids.npy``.
+
+    The files are written next to their final names first and renamed at the end, so that running servers only ever
+    see complete files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.join(directory, database)
+    with conn.cursor() as cur:
+        cur.execute('SELECT count(*), max(length(id)), max(vector_dims(feature)) FROM features_openclip')
+        (count, id_length, dimensions) = cur.fetchone()
+
+    vectors = np.lib.format.open_memmap(prefix + '.vectors.tmp.npy', mode='w+', dtype=dtype,
+                                        shape=(count, dimensions or 0))
+    ids = np.empty(count, dtype=f'<U{id_length or 1}')
+    with conn.cursor(name='ferelight_export') as cur:
+        cur.itersize = EXPORT_BATCH_SIZE
+        # Arrays of reals do not depend on the vector type adapter of the installed pgvector version
+        cur.execute('SELECT id, feature::real[] FROM features_openclip')
+        row = 0
+        while True:
+            batch = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not batch:
+                break
+            vectors[row:row + len(batch)] = _normalize(np.asarray([feature for (_, feature) in batch],
+                                                                  dtype=np.float32))
+            ids[row:row + len(batch)] = [segmentid for (segmentid, _) in batch]
+            row += len(batch)
+    vectors.flush()
+    del vectors
+    np.save(prefix + '.ids.tmp.npy', ids[:row])
+
+    os.replace(prefix + '.vectors.tmp.npy', prefix + '.vectors.npy')
+    os.replace(prefix + '.ids.tmp.npy', prefix + '.ids.npy')
+    invalidate(database)
+    logger.info('Exported %d vectors of database %s to %s', row, database, directory)
+    return row
+
+
+def get_index(database):
+    """Returns the local index of a database if VECTORINDEX selects it, or None to use pgvector."""
+    if database in _indexes:
+        return _indexes[database]
+    if not has_app_context():
+        return None
+
+    config = current_app.config
+    backend = config.get('VECTORINDEX', {}).get(database, 'pgvector')
+    index = None
+    if backend in ('local', 'ivfpq'):
+        directory = get_directory(config)
+        try:
+            if backend == 'local':
+                index = LocalVectorIndex(directory, database)
+            else:
+                from ferelight import ivfpq
+                index = ivfpq.IVFPQIndex(directory, database, config.get('VECTORINDEXNPROBE', ivfpq.DEFAULT_NPROBE))
+            logger.info('Using the %s vector index of database %s with %d vectors', backend, database, len(index))
+        except (OSError, ValueError):
+            logger.exception('Could not load the %s vector index of database %s from %s, using pgvector',
+                             backend, database, directory)
+    elif backend != 'pgvector':
+        logger.warning('Unknown vector index %s for database %s, using pgvector', backend, database)
+
+    with _indexes_lock:
+        return _indexes.setdefault(database, index)
+
+
+def get_directory(config):
+    # By default, indexes are stored in an indexes directory next to config.json
+    root = os.path.join(current_app.root_path, '..') if has_app_context() else os.getcwd()
+    return config.get('VECTORINDEXDIR', os.path.join(root, 'indexes'))
+
+
+def invalidate(database=None):
+    """Drops loaded indexes, so that they are loaded again from disk on their next use."""
+    with _indexes_lock:
+        if database is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(database, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and evaluate the local vector indexes of a database.')
+    parser.add_argument('--config', default='config.json', help='The FERElight configuration file.')
+    parser.add_argument('--directory', help='Where the indexes are stored, VECTORINDEXDIR or ./indexes by default.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='Export the features_openclip table into an exact local index.')
+    export.add_argument('database', help='The name of the database to export.')
+    export.add_argument('--dtype', default='float16', choices=('float16', 'float32'),
+                        help='The precision of the stored vectors.')
+
+    build = commands.add_parser('build', help='Build the IVF-PQ index of an exported database.')
+    build.add_argument('database', help='The name of the exported database.')
+    build.add_argument('--nlist', type=int, help='The number of inverted lists, 4 * sqrt(vectors) by default.')
+    build.add_argument('--m', type=int, help='The number of bytes per vector, one per 8 dimensions by default.')
+    build.add_argument('--iterations', type=int, default=20, help='The number of k-means iterations.')
+
+    report = commands.add_parser('report', help='Compare the recall and latency of the IVF-PQ index to exact search.')
+    report.add_argument('database', help='The name of the database with an IVF-PQ index.')
+    report.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64],
+                        help='The values of nprobe to evaluate.')
+    report.add_argument('--queries', type=int, default=100, help='The number of stored vectors to query with.')
+    report.add_argument('--limit', type=int, default=100, help='The number of results per query.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.config) as f:
+        config = json.load(f)
+    directory = args.directory or config.get('VECTORINDEXDIR', os.path.join(os.getcwd(), 'indexes'))
+
+    if args.command == 'export':
+        import psycopg2
+        conn = psycopg2.connect(dbname=args.database, user=config.get('DBUSER'), password=config.get('DBPASSWORD'),
+                                host=config.get('DBHOST'), port=config.get('DBPORT'))
+        try:
+            export_index(conn, directory, args.database, args.dtype)
+        finally:
+            conn.close()
+        return
+
+    from ferelight import ivfpq
+    if args.command == 'build':
+        ivfpq.build_index(directory, args.database, args.nlist, args.m, args.iterations)
+    else:
+        rows, exact_ms = ivfpq.recall_report(directory, args.database, args.nprobe, args.queries, args.limit)
+        print(f'{"nprobe":>8} {f"recall@{args.limit}":>12} {"ms/query":>10}')
+        for nprobe, recall, ms in rows:
+            print(f'{nprobe:>8} {recall:>12.4f} {ms:>10.2f}')
+        print(f'{"exact":>8} {1:>12.4f} {exact_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
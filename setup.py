@@ -29,7 +29,8 @@ setup(
     package_data={'': ['openapi/openapi.yaml']},
     include_package_data=True,
     entry_points={
-        'console_scripts': ['ferelight=ferelight.__main__:main']},
+        'console_scripts': ['ferelight=ferelight.__main__:main',
+                            'ferelight-index=ferelight.vectorindex:main']},
     long_description="""\
     API for the lightweight feature extraction and retrieval engine (FERElight).
     """